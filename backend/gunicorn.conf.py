@@ -0,0 +1,28 @@
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py src.wsgi:app
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Procesos: por defecto 2 x núcleos + 1
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Threads por proceso: las rutas pasan la mayor parte del tiempo esperando a la base de datos.
+# Cada thread puede tomar una conexión, por lo que DB_POOL_SIZE + DB_MAX_OVERFLOW debe ser >= threads
+# y workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) no debe superar max_connections de Postgres.
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = "gthread" if threads > 1 else "sync"
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Reciclar procesos de a poco evita que crezca la memoria en procesos de larga vida
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Sin preload: cada worker crea su propio pool de conexiones y sus threads de correo después del fork
+preload_app = False
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
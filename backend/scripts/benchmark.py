@@ -0,0 +1,320 @@
+"""
+Benchmark reproducible de la API con tenants sintéticos.
+
+Crea el esquema de src/models.py en SQLite (por defecto, un archivo temporal) o en
+la base indicada con --database-url, lo llena con datos aleatorios (semilla fija)
+y recorre cada blueprint con el test client de Flask. Por ruta informa latencia
+p50/p99, consultas SQL por request y la memoria máxima del proceso (RSS).
+
+    python scripts/benchmark.py
+    python scripts/benchmark.py --products 10000 --movements 100000 --invoices 50000
+    python scripts/benchmark.py --database-url postgresql://localhost/bench --reset
+    python scripts/benchmark.py --json despues.json --compare antes.json
+
+Con --json se guardan los resultados para comparar dos ramas con --compare.
+Con --no-cache se desactivan las cachés del proceso (tenant y productos por
+código) para medir el costo de un request con la caché fría.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, insert
+from src.app import create_app
+from src.models import (db, User, Inventory, Configuration, Customer, Product, Provider, Ubicacion,
+                        Category, Sale, Invoice, Purchase, Movement)
+
+CHUNK_SIZE = 5000
+CATEGORIES = ["Herramientas", "Electricidad", "Ferretería", "Pinturas", "Gasfitería", "Jardín"]
+MOVEMENT_TYPES = ["ingreso", "venta", "ajuste", "compra", "devolucion"]
+
+# (nombre, método, ruta, cuerpo). {product_id}, {customer_id}, etc. se reemplazan por ids del tenant
+SCENARIOS = [
+    ("profile", "GET", "/api/profile", None),
+    ("inventory", "GET", "/api/inventory", None),
+    ("stock_at", "GET", "/api/inventory/stock-at?date={today}", None),
+    ("products", "GET", "/api/products", None),
+    ("products_page", "GET", "/api/products?limit=50", None),
+    ("product", "GET", "/api/products/{product_id}", None),
+    ("product_by_code", "GET", "/api/products/by-code/{product_codigo}", None),
+    ("product_search", "GET", "/api/products/search?q=producto", None),
+    ("product_search_code", "GET", "/api/products/search?q=T0-000010", None),
+    ("customers", "GET", "/api/customers", None),
+    ("providers", "GET", "/api/providers?limit=50", None),
+    ("ubicaciones", "GET", "/api/ubicaciones", None),
+    ("categories", "GET", "/api/categories", None),
+    ("configuraciones", "GET", "/api/configuraciones", None),
+    ("sales", "GET", "/api/sales", None),
+    ("sales_page", "GET", "/api/sales?limit=50", None),
+    ("invoices", "GET", "/api/invoices", None),
+    ("invoices_page", "GET", "/api/invoices?limit=50", None),
+    ("movements", "GET", "/api/movements", None),
+    ("movements_page", "GET", "/api/movements?limit=50", None),
+    ("purchases_page", "GET", "/api/purchases?limit=50", None),
+    ("dashboard_kpis", "GET", "/api/dashboard/kpis", None),
+    ("export_sales", "GET", "/api/exports/sales.ndjson", None),
+    ("export_movements", "GET", "/api/exports/movements.csv", None),
+    ("export_products", "GET", "/api/exports/products.csv", None),
+    ("create_sale", "POST", "/api/sales", {"customer_id": "{customer_id}", "product_id": "{product_id}", "quantity": 1}),
+    ("create_movement", "POST", "/api/movements", {"product_id": "{product_id}", "type": "ingreso", "quantity": 1}),
+]
+
+
+def _chunks(rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        yield rows[start:start + CHUNK_SIZE]
+
+
+def _bulk_insert(model, rows):
+    for chunk in _chunks(rows):
+        db.session.execute(insert(model), chunk)
+
+
+def _ids(model, **filters):
+    return [row[0] for row in db.session.query(model.id).filter_by(**filters).order_by(model.id)]
+
+
+def seed_tenant(number, sizes, rng):
+    """Crea un usuario con su inventario y catálogo. Retorna los ids que usan los escenarios."""
+    now = datetime.now()
+
+    def random_date():
+        return now - timedelta(days=rng.randint(0, 364), seconds=rng.randint(0, 86399))
+
+    user = User(email=f"tenant{number}@bench.local", password="bench", first_name="Tenant",
+                last_name=str(number), role="admin")
+    db.session.add(user)
+    db.session.flush()
+    inventory = Inventory(user_id=user.id)
+    db.session.add(inventory)
+    db.session.add(Configuration(user_id=user.id))
+    db.session.flush()
+
+    _bulk_insert(Ubicacion, [
+        {"nombre": f"Bodega {i}", "inventory_id": inventory.id} for i in range(sizes.ubicaciones)
+    ])
+    ubicacion_ids = _ids(Ubicacion, inventory_id=inventory.id)
+
+    _bulk_insert(Product, [{
+        "codigo": f"T{number}-{i:07d}",
+        "nombre": f"Producto {i} {rng.choice(CATEGORIES).lower()}",
+        "stock": rng.randint(0, 500),
+        "precio": round(rng.uniform(500, 50000), 2),
+        "categoria": rng.choice(CATEGORIES),
+        "inventory_id": inventory.id,
+        "user_id": user.id,
+        "ubicacion_id": rng.choice(ubicacion_ids) if ubicacion_ids else None,
+    } for i in range(sizes.products)])
+    product_ids = _ids(Product, user_id=user.id)
+
+    _bulk_insert(Customer, [{
+        "name": f"Cliente {i}", "email": f"cliente{i}@t{number}.local", "rut": f"{10000000 + i}-{i % 10}",
+        "user_id": user.id,
+    } for i in range(sizes.customers)])
+    customer_ids = _ids(Customer, user_id=user.id)
+
+    _bulk_insert(Provider, [{
+        "name": f"Proveedor {i}", "rut": f"{70000000 + i}-{i % 10}", "inventory_id": inventory.id,
+    } for i in range(sizes.providers)])
+    provider_ids = _ids(Provider, inventory_id=inventory.id)
+
+    _bulk_insert(Sale, [{
+        "user_id": user.id, "inventory_id": inventory.id, "product_id": rng.choice(product_ids),
+        "customer_id": rng.choice(customer_ids), "quantity": rng.randint(1, 5),
+        "total": round(rng.uniform(500, 250000), 2), "sale_date": random_date(),
+    } for _ in range(sizes.sales)])
+
+    _bulk_insert(Invoice, [{
+        "user_id": user.id, "inventory_id": inventory.id, "customer_id": rng.choice(customer_ids),
+        "numero_comprobante": f"T{number}-F{i:07d}", "monto_base": base, "impuesto_aplicado": 0.19,
+        "total_final": round(base * 1.19, 2), "invoice_date": random_date(),
+        "status": rng.choice(["Pagada", "Pendiente"]), "tipo": "Factura", "hidden": False,
+    } for i, base in enumerate(round(rng.uniform(1000, 500000), 2) for _ in range(sizes.invoices))])
+
+    _bulk_insert(Purchase, [{
+        "orden_compra": f"T{number}-OC{i:07d}", "metodo": "Transferencia",
+        "provider_id": rng.choice(provider_ids), "product_id": rng.choice(product_ids),
+        "inventory_id": inventory.id, "quantity": rng.randint(1, 100),
+        "total": round(rng.uniform(1000, 500000), 2), "purchase_date": random_date(),
+    } for i in range(sizes.purchases)])
+
+    _bulk_insert(Movement, [{
+        "product_id": rng.choice(product_ids), "inventory_id": inventory.id,
+        "type": rng.choice(MOVEMENT_TYPES), "quantity": rng.randint(1, 20),
+        "date": random_date(), "registered_by": user.id,
+    } for _ in range(sizes.movements)])
+
+    db.session.commit()
+    return {
+        "user_id": user.id,
+        "product_id": product_ids[len(product_ids) // 2],
+        "product_codigo": f"T{number}-{len(product_ids) // 2:07d}",
+        "customer_id": customer_ids[0],
+        "today": now.date().isoformat(),
+    }
+
+
+def seed(sizes, rng):
+    if not Category.query.first():
+        _bulk_insert(Category, [{"nombre": name} for name in CATEGORIES])
+        db.session.commit()
+    return [seed_tenant(number, sizes, rng) for number in range(sizes.tenants)]
+
+
+def _fill(value, ids):
+    if isinstance(value, str):
+        value = value.format(**ids)
+        return int(value) if value.isdigit() else value
+    if isinstance(value, dict):
+        return {key: _fill(item, ids) for key, item in value.items()}
+    return value
+
+
+def _peak_rss_mb():
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenarios(app, tenant, requests_per_route, only=None):
+    """
+    Cada request usa su propio contexto (sin app_context() externo), como en
+    gunicorn: g y la sesión no se comparten entre requests, así las consultas
+    y la latencia medidas son las de un request real.
+    """
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(tenant['user_id']))}"}
+        engine = db.engine
+    client = app.test_client()
+    counter = {"queries": 0}
+
+    def count_query(*args):
+        counter["queries"] += 1
+
+    event.listen(engine, "before_cursor_execute", count_query)
+    results = {}
+    try:
+        for name, method, path, body in SCENARIOS:
+            if only and name not in only:
+                continue
+            url = _fill(path, tenant)
+            payload = _fill(body, tenant)
+            # Calentamiento: cachés de tenant, planes de consulta, etc.
+            client.open(url, method=method, headers=headers, json=payload)
+
+            latencies, queries, statuses = [], [], set()
+            for _ in range(requests_per_route):
+                counter["queries"] = 0
+                start = time.perf_counter()
+                response = client.open(url, method=method, headers=headers, json=payload)
+                response.get_data()  # consume también las respuestas en streaming
+                latencies.append((time.perf_counter() - start) * 1000)
+                queries.append(counter["queries"])
+                statuses.add(response.status_code)
+            latencies.sort()
+            results[name] = {
+                "p50_ms": round(statistics.median(latencies), 2),
+                "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+                "queries": round(statistics.mean(queries), 1),
+                "status": sorted(statuses),
+                "peak_rss_mb": round(_peak_rss_mb(), 1),
+            }
+    finally:
+        event.remove(engine, "before_cursor_execute", count_query)
+    return results
+
+
+def print_results(results, baseline=None):
+    print(f"{'ruta':<20} {'p50 ms':>9} {'p99 ms':>9} {'consultas':>10} {'RSS MB':>8}  estado")
+    for name, result in results.items():
+        line = (f"{name:<20} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+                f"{result['queries']:>10.1f} {result['peak_rss_mb']:>8.1f}  {','.join(map(str, result['status']))}")
+        before = (baseline or {}).get(name)
+        if before:
+            change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            line += f"  p50 {change:+.0f}%  consultas {before['queries']:.1f} -> {result['queries']:.1f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la API con datos sintéticos")
+    parser.add_argument("--database-url", help="Por defecto, SQLite en un archivo temporal")
+    parser.add_argument("--reset", action="store_true", help="Borra y recrea las tablas antes de sembrar")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tenants", type=int, default=1)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--movements", type=int, default=20000)
+    parser.add_argument("--invoices", type=int, default=10000)
+    parser.add_argument("--sales", type=int, default=10000)
+    parser.add_argument("--purchases", type=int, default=2000)
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--providers", type=int, default=100)
+    parser.add_argument("--ubicaciones", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=20, help="Requests medidos por ruta")
+    parser.add_argument("--only", help="Rutas a medir, separadas por coma")
+    parser.add_argument("--no-cache", action="store_true", help="Sin cachés del proceso (tenant, productos)")
+    parser.add_argument("--json", help="Guarda los resultados en este archivo")
+    parser.add_argument("--compare", help="Resultados anteriores (--json) para comparar")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    temp_path = None
+    if not database_url:
+        handle, temp_path = tempfile.mkstemp(prefix="bench-", suffix=".sqlite")
+        os.close(handle)
+        database_url = f"sqlite:///{temp_path}"
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "SQLALCHEMY_ENGINE_OPTIONS": {},
+        "JWT_SECRET_KEY": "benchmark-secret-key-with-enough-length",
+        "SECRET_KEY": "benchmark",
+        "MAIL_SUPPRESS_SEND": True,
+        "METRICS_ENABLED": False,
+        **({"TENANT_CACHE_TTL": 0, "PRODUCT_CACHE_TTL": 0} if args.no_cache else {}),
+    })
+    rng = random.Random(args.seed)
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        start = time.perf_counter()
+        tenants = seed(args, rng)
+        print(f"Datos sembrados en {time.perf_counter() - start:.1f} s ({database_url})")
+
+    only = {name.strip() for name in args.only.split(",")} if args.only else None
+    results = run_scenarios(app, tenants[0], args.requests, only)
+    with app.app_context():
+        db.engine.dispose()
+    if temp_path:
+        os.remove(temp_path)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+    print(f"RSS máximo: {_peak_rss_mb():.1f} MB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"sizes": {key: value for key, value in vars(args).items()
+                                 if key in ("tenants", "products", "movements", "invoices", "sales",
+                                            "purchases", "customers", "providers", "ubicaciones", "seed")},
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
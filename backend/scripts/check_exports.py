@@ -0,0 +1,78 @@
+"""
+Descarga cada exportación completa como lo haría un cliente HTTP.
+
+    python scripts/check_exports.py [--rows 50]
+
+Crea un tenant en una base SQLite temporal con --rows ventas, facturas y
+compras, y pide cada /api/exports/<recurso>.<ndjson|csv> con un test client
+sin app_context() externo: la respuesta se consume después del teardown del
+request, igual que en gunicorn. Termina con código 1 si alguna exportación
+falla o no trae todas las filas.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from flask_jwt_extended import create_access_token
+from src.app import create_app
+from src.models import db
+from query_budget import Tenant
+
+FORMATS = ("ndjson", "csv")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportaciones completas fuera del contexto de la app")
+    parser.add_argument("--rows", type=int, default=50)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".sqlite")
+    os.close(fd)
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        "SQLALCHEMY_ENGINE_OPTIONS": {},
+        "JWT_SECRET_KEY": os.getenv("JWT_SECRET") or "check-exports-secret-key-32-bytes",
+        "TENANT_CACHE_TTL": 0,
+        "METRICS_ENABLED": False,
+    })
+    failed = False
+    try:
+        with app.app_context():
+            db.create_all()
+            tenant = Tenant()
+            tenant.add_sales(args.rows)
+            tenant.add_invoices(args.rows)
+            tenant.add_purchases(args.rows)
+            db.session.commit()
+            headers = {"Authorization": f"Bearer {create_access_token(identity=str(tenant.user_id))}"}
+        # Filas esperadas por recurso (cada compra agrega un movimiento; cada tanda, sus productos)
+        expected = {"sales": args.rows, "invoices": args.rows, "movements": args.rows, "products": tenant.rows}
+
+        client = app.test_client()
+        for resource, rows in expected.items():
+            for fmt in FORMATS:
+                route = f"/api/exports/{resource}.{fmt}"
+                try:
+                    response = client.get(route, headers=headers)
+                    lines = response.get_data(as_text=True).splitlines()
+                except Exception as e:
+                    print(f"{route:<32}error: {type(e).__name__}: {e}")
+                    failed = True
+                    continue
+                # El CSV trae además la fila de encabezado
+                received = len(lines) - (1 if fmt == "csv" and lines else 0)
+                ok = response.status_code == 200 and received == rows
+                print(f"{route:<32}{response.status_code:>5}{received:>7}/{rows}{'' if ok else '  FALLA'}")
+                failed = failed or not ok
+    finally:
+        os.remove(path)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Crea en una base existente los índices declarados en src/models.py.
+
+    python scripts/create_indexes.py [--database-url postgresql://...] [--sql]
+
+backend/migrations no se versiona (cada ambiente tiene su propio historial de
+Alembic), así que este script aplica los índices sin depender de ese historial:
+solo crea los que faltan y se puede correr más de una vez. Usa DATABASE_URL si
+no se indica --database-url; con --sql solo imprime el DDL.
+
+En PostgreSQL primero crea la extensión pg_trgm, que necesitan los índices GIN
+de búsqueda de productos. CREATE EXTENSION requiere un rol con permiso CREATE
+sobre la base (pg_trgm es "trusted" desde PostgreSQL 13); si el rol de la app
+no lo tiene, un administrador debe correr antes:
+
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+Con Flask-Migrate, `pipenv run migrate` también detecta los índices, pero la
+revisión generada no incluye la extensión: agregar
+op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm") al inicio de upgrade()
+antes de `pipenv run upgrade`.
+"""
+import argparse
+import os
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from src.app import create_app, engine_options
+from src.models import db
+
+TRGM_EXTENSION = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+
+
+def declared_indexes(dialect):
+    for table in db.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            # Índices de un solo motor (por ejemplo los GIN de pg_trgm)
+            ddl_if = index._ddl_if
+            if ddl_if is not None and ddl_if.dialect is not None and ddl_if.dialect != dialect:
+                continue
+            yield table, index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crea los índices declarados que falten")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--sql", action="store_true", help="solo imprime el DDL")
+    args = parser.parse_args()
+
+    config = {"METRICS_ENABLED": False}
+    if args.database_url:
+        config["SQLALCHEMY_DATABASE_URI"] = args.database_url
+        config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(args.database_url)
+    app = create_app(config)
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        with db.engine.begin() as connection:
+            inspector = inspect(connection)
+            tables = set(inspector.get_table_names())
+            statements = [TRGM_EXTENSION] if dialect == "postgresql" else []
+            for table, index in declared_indexes(dialect):
+                if table.name not in tables:
+                    print(f"Tabla {table.name} no existe, se omite {index.name} (correr las migraciones primero)")
+                    continue
+                if index.name in {existing["name"] for existing in inspector.get_indexes(table.name)}:
+                    continue
+                statements.append(str(CreateIndex(index).compile(dialect=connection.dialect)).strip())
+
+            for statement in statements:
+                print(f"{statement};")
+                if not args.sql:
+                    connection.execute(text(statement))
+        if not args.sql:
+            created = len(statements) - (1 if dialect == "postgresql" else 0)
+            print(f"{created} índices creados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Planes de ejecución de las consultas por tenant más usadas.
+
+    python scripts/explain_plans.py [--database-url postgresql://...]
+
+Sin --database-url crea el esquema en una base SQLite temporal y revisa
+EXPLAIN QUERY PLAN. Con una URL de PostgreSQL (base de pruebas: se crean las
+tablas que falten) revisa EXPLAIN con enable_seqscan apagado, así el planner
+solo elige Seq Scan cuando no hay un índice que sirva aunque las tablas estén
+vacías. Termina con código 1 si alguna consulta recorre la tabla completa.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import date, datetime
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import func, or_, select, text
+from src.app import create_app, engine_options
+from src.models import (db, Customer, Product, Provider, Ubicacion, Sale, SaleOrder, Invoice,
+                        Purchase, Movement, StockSnapshot)
+
+USER_ID, INVENTORY_ID, PRODUCT_ID = 1, 1, 1
+SINCE = datetime(2024, 1, 1)
+
+# (nombre, consulta) con los filtros que usan los endpoints
+QUERIES = [
+    ("products por usuario", select(Product).where(Product.user_id == USER_ID)),
+    ("products por inventario", select(Product).where(Product.inventory_id == INVENTORY_ID)),
+    ("customers por email", select(Customer).where(Customer.user_id == USER_ID, Customer.email == "a@b.cl")),
+    ("sales por fecha", select(Sale).where(Sale.user_id == USER_ID, Sale.sale_date >= SINCE)),
+    ("sales por producto", select(Sale).where(Sale.product_id == PRODUCT_ID)),
+    ("sale_orders por fecha", select(SaleOrder).where(SaleOrder.user_id == USER_ID, SaleOrder.order_date >= SINCE)),
+    ("invoices por fecha", select(Invoice).where(Invoice.user_id == USER_ID, Invoice.invoice_date >= SINCE)),
+    ("invoices por cliente", select(Invoice).where(Invoice.customer_id == 1)),
+    ("purchases por fecha", select(Purchase).where(Purchase.inventory_id == INVENTORY_ID, Purchase.purchase_date >= SINCE)),
+    ("purchases por producto", select(Purchase).where(Purchase.product_id == PRODUCT_ID)),
+    ("providers por inventario", select(Provider).where(Provider.inventory_id == INVENTORY_ID)),
+    ("providers por prefijo", select(Provider).where(Provider.inventory_id == INVENTORY_ID, or_(
+        func.lower(Provider.name).like("ferr%"), func.lower(Provider.rut).like("ferr%")))),
+    ("ubicaciones por inventario", select(Ubicacion).where(Ubicacion.inventory_id == INVENTORY_ID)),
+    ("movements por producto", select(Movement).where(
+        Movement.inventory_id == INVENTORY_ID, Movement.product_id == PRODUCT_ID, Movement.date >= SINCE)),
+    ("movements por fecha", select(Movement).where(Movement.inventory_id == INVENTORY_ID, Movement.date >= SINCE)),
+    ("movements por venta", select(Movement).where(Movement.sale_id == 1)),
+    ("stock_snapshots por día", select(StockSnapshot).where(
+        StockSnapshot.inventory_id == INVENTORY_ID, StockSnapshot.snapshot_date <= date(2024, 1, 1))),
+]
+
+
+def explain(connection, statement):
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    if connection.dialect.name == "sqlite":
+        # Filas (id, parent, notused, detail)
+        return [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    return [row[0] for row in connection.execute(text(f"EXPLAIN {sql}"))]
+
+
+def full_scans(dialect, plan):
+    if dialect == "sqlite":
+        # "SCAN tabla" sin índice; "SEARCH tabla USING INDEX ..." es lo esperado
+        return [line for line in plan if re.match(r"SCAN \w+$", line.strip())]
+    return [line for line in plan if "Seq Scan" in line]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas por tenant sin recorridos completos de tabla")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    path = None
+    url = args.database_url
+    if not url:
+        fd, path = tempfile.mkstemp(suffix=".sqlite")
+        os.close(fd)
+        url = f"sqlite:///{path}"
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": url,
+        "SQLALCHEMY_ENGINE_OPTIONS": engine_options(url),
+        "JWT_SECRET_KEY": os.getenv("JWT_SECRET") or "explain-plans-secret-key-32-bytes",
+        "METRICS_ENABLED": False,
+    })
+    failed = False
+    try:
+        with app.app_context():
+            db.create_all()
+            with db.engine.connect() as connection:
+                dialect = connection.dialect.name
+                if dialect == "postgresql":
+                    connection.execute(text("SET enable_seqscan = off"))
+                for name, statement in QUERIES:
+                    plan = explain(connection, statement)
+                    scans = full_scans(dialect, plan)
+                    print(f"{'FULL SCAN' if scans else 'ok':<10}{name}")
+                    for line in plan:
+                        print(f"    {line}")
+                    failed = failed or bool(scans)
+    finally:
+        if path:
+            os.remove(path)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Presupuesto de tiempo de arranque, medido con `python -X importtime`.
+
+    python scripts/importtime.py [--budget-ms 600]
+
+Importa src.app y ejecuta create_app() en un proceso nuevo, muestra los módulos
+que más tardan y termina con código 1 si se supera el presupuesto o si se cargó
+alguna dependencia que debe importarse recién al usarse.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Dependencias pesadas que solo necesitan algunas rutas o comandos
+LAZY_MODULES = ("google.auth", "google.oauth2", "requests", "flask_mail", "flask_migrate", "alembic", "openpyxl")
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure():
+    code = "from src.app import create_app; create_app()"
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env.setdefault("ENABLED_BLUEPRINTS", "")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit(result.returncode)
+
+    modules = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(cumulative_us), len(indent)))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Presupuesto de tiempo de importación del backend")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", 600)))
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    modules = measure()
+    # Los módulos de primer nivel (sangría 1) suman el tiempo total
+    total_ms = sum(cumulative for _, cumulative, indent in modules if indent == 1) / 1000
+
+    print(f"{'ms':>8}  módulo")
+    top_level = sorted((m for m in modules if m[2] == 1), key=lambda m: m[1], reverse=True)
+    for name, cumulative, _ in top_level[:args.top]:
+        print(f"{cumulative / 1000:>8.1f}  {name}")
+    print(f"Total: {total_ms:.1f} ms (presupuesto {args.budget_ms:.0f} ms)")
+
+    failed = False
+    eager = sorted({
+        name for name, _, _ in modules
+        if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)
+    })
+    if eager:
+        print("Dependencias que deberían importarse al usarse: " + ", ".join(eager[:10]))
+        failed = True
+    if total_ms > args.budget_ms:
+        print("Se superó el presupuesto de tiempo de importación")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
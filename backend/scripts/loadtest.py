@@ -0,0 +1,150 @@
+"""
+Prueba de carga simple (solo biblioteca estándar).
+
+Contra un servidor ya levantado:
+    python scripts/loadtest.py --url http://localhost:5000/api/products --token <JWT>
+
+Escalamiento por núcleos: levanta gunicorn con 1, 2, 4... workers y mide cada uno
+    python scripts/loadtest.py --path /api/products --token <JWT> --scale 1,2,4,8
+
+Los clientes corren en procesos separados para que el generador de carga no
+quede limitado por el GIL.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _client(url, headers, duration, results):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    ok = errors = 0
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status < 400:
+                ok += 1
+            else:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    results.put((ok, errors, latencies))
+
+
+def run_load(url, token=None, concurrency=16, duration=10):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    results = multiprocessing.Queue()
+    clients = [
+        multiprocessing.Process(target=_client, args=(url, headers, duration, results))
+        for _ in range(concurrency)
+    ]
+    for client in clients:
+        client.start()
+    ok = errors = 0
+    latencies = []
+    for _ in clients:
+        c_ok, c_errors, c_latencies = results.get()
+        ok += c_ok
+        errors += c_errors
+        latencies.extend(c_latencies)
+    for client in clients:
+        client.join()
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+    return {
+        "requests": ok,
+        "errors": errors,
+        "rps": ok / duration,
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def _wait_for(server, host, port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline and server.poll() is None:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def run_scaling(worker_counts, path, token, concurrency, duration, threads, port):
+    rows = []
+    for workers in worker_counts:
+        env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+                   PORT=str(port), GUNICORN_ACCESS_LOG="/dev/null")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "src.wsgi:app"],
+            cwd=BACKEND_DIR, env=env
+        )
+        try:
+            if not _wait_for(server, "127.0.0.1", port):
+                print(f"gunicorn no respondió con {workers} workers")
+                continue
+            run_load(f"http://127.0.0.1:{port}{path}", token, concurrency, 2)  # calentamiento
+            rows.append((workers, run_load(f"http://127.0.0.1:{port}{path}", token, concurrency, duration)))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+
+    base = rows[0][1]["rps"] if rows and rows[0][1]["rps"] else None
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errores':>8} {'escala':>7}")
+    for workers, result in rows:
+        speedup = f"{result['rps'] / base:.2f}x" if base else "-"
+        print(f"{workers:>8} {result['rps']:>10.1f} {result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+              f"{result['errors']:>8} {speedup:>7}")
+    print(f"Núcleos disponibles: {multiprocessing.cpu_count()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del backend")
+    parser.add_argument("--url", help="URL completa contra un servidor ya levantado")
+    parser.add_argument("--path", default="/api/products", help="Ruta a medir en modo --scale")
+    parser.add_argument("--token", default=os.getenv("LOADTEST_TOKEN"), help="JWT para rutas protegidas")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clientes simultáneos")
+    parser.add_argument("--duration", type=int, default=10, help="Segundos por medición")
+    parser.add_argument("--scale", help="Cantidades de workers a comparar, por ejemplo 1,2,4")
+    parser.add_argument("--threads", type=int, default=4, help="Threads por worker en modo --scale")
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    if args.scale:
+        counts = [int(n) for n in args.scale.split(",")]
+        run_scaling(counts, args.path, args.token, args.concurrency, args.duration, args.threads, args.port)
+    elif args.url:
+        result = run_load(args.url, args.token, args.concurrency, args.duration)
+        print(f"{result['requests']} requests, {result['errors']} errores, {result['rps']:.1f} req/s, "
+              f"p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms")
+    else:
+        parser.error("Indique --url o --scale")
+
+
+if __name__ == "__main__":
+    main()
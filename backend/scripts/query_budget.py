@@ -0,0 +1,159 @@
+"""
+Regresión de consultas SQL por request en los listados.
+
+    python scripts/query_budget.py [--small 20] [--large 200]
+
+Crea un tenant en una base SQLite temporal, llena cada listado con --small filas
+(cada una con su propio producto, ubicación, cliente, etc.), cuenta las consultas
+de un GET y repite con --large filas. Termina con código 1 si la cantidad de
+consultas crece con el número de filas (por ejemplo, una carga lazy por fila).
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, insert
+from src.app import create_app
+from src.models import (db, User, Inventory, Customer, Product, Provider, Ubicacion,
+                        Sale, Invoice, Purchase, Movement)
+
+
+class Tenant:
+    def __init__(self):
+        user = User(email="budget@test.local", password="x", first_name="Query", last_name="Budget", role="admin")
+        db.session.add(user)
+        db.session.flush()
+        inventory = Inventory(user_id=user.id)
+        db.session.add(inventory)
+        db.session.flush()
+        self.user_id, self.inventory_id = user.id, inventory.id
+        self.rows = 0
+
+    def _catalog(self, count):
+        """Un producto (con su ubicación), cliente y proveedor distintos por fila."""
+        start = self.rows
+        self.rows += count
+        ubicaciones = db.session.execute(insert(Ubicacion).returning(Ubicacion.id), [
+            {"nombre": f"Bodega {i}", "inventory_id": self.inventory_id} for i in range(start, self.rows)
+        ]).scalars().all()
+        products = db.session.execute(insert(Product).returning(Product.id), [{
+            "codigo": f"QB-{i}", "nombre": f"Producto {i}", "stock": 100, "precio": 1000, "categoria": "Test",
+            "inventory_id": self.inventory_id, "user_id": self.user_id, "ubicacion_id": ubicacion_id,
+        } for i, ubicacion_id in zip(range(start, self.rows), ubicaciones)]).scalars().all()
+        customers = db.session.execute(insert(Customer).returning(Customer.id), [
+            {"name": f"Cliente {i}", "email": f"c{i}@test.local", "user_id": self.user_id}
+            for i in range(start, self.rows)
+        ]).scalars().all()
+        providers = db.session.execute(insert(Provider).returning(Provider.id), [
+            {"name": f"Proveedor {i}", "inventory_id": self.inventory_id} for i in range(start, self.rows)
+        ]).scalars().all()
+        return list(zip(range(start, self.rows), products, customers, providers))
+
+    def add_sales(self, count):
+        rows = self._catalog(count)
+        db.session.execute(insert(Sale), [{
+            "user_id": self.user_id, "inventory_id": self.inventory_id, "product_id": product_id,
+            # Ventas antiguas sin cliente usan el cliente por defecto del usuario
+            "customer_id": customer_id if i % 5 else None, "quantity": 1, "total": 1000,
+        } for i, product_id, customer_id, _ in rows])
+
+    def add_invoices(self, count):
+        rows = self._catalog(count)
+        db.session.execute(insert(Invoice), [{
+            "user_id": self.user_id, "inventory_id": self.inventory_id, "customer_id": customer_id,
+            "numero_comprobante": f"QB-F{i}", "monto_base": 1000, "impuesto_aplicado": 190,
+            "total_final": 1190, "status": "Pending",
+        } for i, _, customer_id, _ in rows])
+
+    def add_purchases(self, count):
+        rows = self._catalog(count)
+        purchases = db.session.execute(insert(Purchase).returning(Purchase.id), [{
+            "orden_compra": f"QB-OC{i}", "metodo": "Transferencia", "provider_id": provider_id,
+            "product_id": product_id, "inventory_id": self.inventory_id, "quantity": 1, "total": 1000,
+        } for i, product_id, _, provider_id in rows]).scalars().all()
+        db.session.execute(insert(Invoice), [{
+            "user_id": self.user_id, "inventory_id": self.inventory_id, "purchase_id": purchase_id,
+            "numero_comprobante": f"QB-FC{i}", "monto_base": 1000, "impuesto_aplicado": 190,
+            "total_final": 810, "status": "Pending",
+        } for (i, _, _, _), purchase_id in zip(rows, purchases)])
+        db.session.execute(insert(Movement), [{
+            "product_id": product_id, "inventory_id": self.inventory_id, "type": "compra", "quantity": 1,
+            "balance": 101, "purchase_id": purchase_id, "registered_by": self.user_id,
+        } for (_, product_id, _, _), purchase_id in zip(rows, purchases)])
+
+
+# (nombre, ruta, función que agrega filas al listado)
+LISTINGS = [
+    ("sales", "/api/sales", Tenant.add_sales),
+    ("invoices", "/api/invoices", Tenant.add_invoices),
+    ("purchases", "/api/purchases", Tenant.add_purchases),
+]
+
+
+def count_queries(app, path, headers):
+    counter = {"queries": 0}
+
+    def count_query(*args):
+        counter["queries"] += 1
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", count_query)
+        try:
+            response = app.test_client().get(path, headers=headers)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count_query)
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} respondió {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return counter["queries"], len(response.get_json())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas SQL por request constantes en los listados")
+    parser.add_argument("--small", type=int, default=20)
+    parser.add_argument("--large", type=int, default=200)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".sqlite")
+    os.close(fd)
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        "SQLALCHEMY_ENGINE_OPTIONS": {},
+        "JWT_SECRET_KEY": os.getenv("JWT_SECRET") or "query-budget-secret-key-32-bytes!",
+        "TENANT_CACHE_TTL": 0,
+        "METRICS_ENABLED": False,
+    })
+    failed = False
+    try:
+        with app.app_context():
+            db.create_all()
+            tenant = Tenant()
+            db.session.commit()
+            headers = {"Authorization": f"Bearer {create_access_token(identity=str(tenant.user_id))}"}
+
+        print(f"{'listado':<12}{'filas':>8}{'consultas':>11}{'filas':>8}{'consultas':>11}")
+        for name, route, add_rows in LISTINGS:
+            measured = []
+            for target in (args.small, args.large):
+                with app.app_context():
+                    add_rows(tenant, target - (measured[-1][1] if measured else 0))
+                    db.session.commit()
+                queries, rows = count_queries(app, route, headers)
+                measured.append((queries, rows))
+            (small_q, small_rows), (large_q, large_rows) = measured
+            print(f"{name:<12}{small_rows:>8}{small_q:>11}{large_rows:>8}{large_q:>11}")
+            if large_q != small_q:
+                print(f"  {route}: las consultas crecen con las filas ({small_q} -> {large_q})")
+                failed = True
+    finally:
+        os.remove(path)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
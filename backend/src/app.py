@@ -5,71 +5,151 @@ BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if BASE_DIR not in sys.path:
     sys.path.append(BASE_DIR)
 
+import importlib
 from flask import Flask, jsonify
-from flask_migrate import Migrate
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from src.models import db
-from src.routes.routes import api
+from src.models import db, Inventory
 from dotenv import load_dotenv
-from datetime import timedelta
-from flask_mail import Mail
-from src.routes.invoices_api import invoices_api
-from src.routes.customers_api import customers_api
-from src.routes.products_api import products_api
-from src.routes.providers_api import providers_api
-from src.routes.movements_api import movements_api
-from src.routes.ubications_api import ubications_api
-from src.routes.configurations_api import configurations_api
-from src.routes.purchases_api import purchases_api
-from src.routes.sales_api import sales_api
-from src.routes.categories_api import categories_api
+from datetime import date, timedelta
+import click
+from flask.cli import with_appcontext
+from src.mailer import mail_dispatcher
+from src.metrics import metrics
 
 load_dotenv()
 
-app = Flask(__name__)
-app.config['DEBUG'] = True
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
-app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(minutes=30)  # Duración del refresh token
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 465
-app.config['MAIL_USE_TLS'] = False
-app.config['MAIL_USE_SSL'] = True
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
-app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_USERNAME')
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-
-mail = Mail(app)
-db.init_app(app)
-migrate = Migrate(app, db)
-jwt = JWTManager(app)
-CORS(app)
-
-@app.after_request
-def add_security_headers(response):
-    response.headers['Cross-Origin-Opener-Policy'] = 'same-origin'
-    return response
-
-@app.route('/')
-def main():
-    return jsonify({"status": "Server running successfully with JWT and Flask"}), 200
-
-# Registro de blueprints
-app.register_blueprint(api, url_prefix="/api")
-app.register_blueprint(invoices_api, url_prefix="/api")
-app.register_blueprint(customers_api, url_prefix="/api")
-app.register_blueprint(products_api, url_prefix="/api")
-app.register_blueprint(providers_api, url_prefix="/api")
-app.register_blueprint(movements_api, url_prefix="/api")
-app.register_blueprint(ubications_api, url_prefix="/api")
-app.register_blueprint(configurations_api, url_prefix="/api")
-app.register_blueprint(purchases_api, url_prefix="/api")
-app.register_blueprint(sales_api, url_prefix="/api")
-app.register_blueprint(categories_api, url_prefix="/api")
+jwt = JWTManager()
 
+# (módulo, blueprint). Los módulos de rutas se importan solo si el blueprint está habilitado
+BLUEPRINTS = [
+    ("src.routes.routes", "api"),
+    ("src.routes.routes", "inventory_api"),
+    ("src.routes.invoices_api", "invoices_api"),
+    ("src.routes.customers_api", "customers_api"),
+    ("src.routes.products_api", "products_api"),
+    ("src.routes.providers_api", "providers_api"),
+    ("src.routes.movements_api", "movements_api"),
+    ("src.routes.ubications_api", "ubications_api"),
+    ("src.routes.configurations_api", "configurations_api"),
+    ("src.routes.purchases_api", "purchases_api"),
+    ("src.routes.sales_api", "sales_api"),
+    ("src.routes.categories_api", "categories_api"),
+    ("src.routes.dashboard_api", "dashboard_api"),
+    ("src.routes.exports_api", "exports_api"),
+]
+
+
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+def engine_options(database_uri):
+    """Opciones del pool de conexiones de SQLAlchemy, configurables por variables de entorno."""
+    options = {
+        # Descarta conexiones cortadas por el servidor o un balanceador antes de usarlas
+        "pool_pre_ping": _env_bool('DB_POOL_PRE_PING', True),
+        "pool_recycle": int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+    # SQLite (desarrollo) no usa QueuePool en todos los modos; el tamaño solo aplica a servidores
+    if database_uri and not database_uri.startswith("sqlite"):
+        options.update({
+            # Por proceso: debe cubrir los threads de cada worker de gunicorn
+            "pool_size": int(os.getenv('DB_POOL_SIZE', 5)),
+            "max_overflow": int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            "pool_timeout": int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        })
+    return options
+
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config['DEBUG'] = _env_bool('FLASK_DEBUG', False)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(os.getenv('DATABASE_URL'))
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
+    app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(minutes=30)  # Duración del refresh token
+    app.config['MAIL_SERVER'] = 'smtp.gmail.com'
+    app.config['MAIL_PORT'] = 465
+    app.config['MAIL_USE_TLS'] = False
+    app.config['MAIL_USE_SSL'] = True
+    app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
+    app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
+    app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_USERNAME')
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+    # Segundos que se cachea el usuario/inventario/configuración resuelto desde el JWT (0 = sin caché)
+    app.config['TENANT_CACHE_TTL'] = int(os.getenv('TENANT_CACHE_TTL', 30))
+    # Caché de /api/products/by-code: segundos de vida (0 = sin caché) y cantidad máxima de productos
+    app.config['PRODUCT_CACHE_TTL'] = int(os.getenv('PRODUCT_CACHE_TTL', 60))
+    app.config['PRODUCT_CACHE_SIZE'] = int(os.getenv('PRODUCT_CACHE_SIZE', 10000))
+    # Folios reservados por proceso en cada acceso al contador (1 = numeración sin saltos)
+    app.config['DOC_SEQUENCE_BLOCK'] = int(os.getenv('DOC_SEQUENCE_BLOCK', 1))
+    # Cola de correos salientes (ver src/mailer.py)
+    app.config['MAIL_ASYNC'] = _env_bool('MAIL_ASYNC', True)
+    app.config['MAIL_QUEUE_SIZE'] = int(os.getenv('MAIL_QUEUE_SIZE', 1000))
+    app.config['MAIL_WORKERS'] = int(os.getenv('MAIL_WORKERS', 1))
+    app.config['MAIL_MAX_RETRIES'] = int(os.getenv('MAIL_MAX_RETRIES', 3))
+    app.config['MAIL_SUPPRESS_SEND'] = _env_bool('MAIL_SUPPRESS_SEND', False)
+    # Métricas en /metrics; SLOW_QUERY_MS > 0 registra las consultas más lentas que ese umbral
+    app.config['METRICS_ENABLED'] = _env_bool('METRICS_ENABLED', True)
+    app.config['SLOW_QUERY_MS'] = int(os.getenv('SLOW_QUERY_MS', 0))
+    # Blueprints a registrar, separados por coma (vacío = todos). Ej: products_api,categories_api
+    app.config['ENABLED_BLUEPRINTS'] = os.getenv('ENABLED_BLUEPRINTS', '')
+    if config:
+        app.config.update(config)
+
+    metrics.init_app(app)
+    mail_dispatcher.init_app(app)
+    db.init_app(app)
+    jwt.init_app(app)
+    # Flask-Migrate (y alembic) solo se necesita para los comandos `flask db ...`
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    CORS(app, expose_headers=["X-Next-Cursor"])
+
+    @app.after_request
+    def add_security_headers(response):
+        response.headers['Cross-Origin-Opener-Policy'] = 'same-origin'
+        return response
+
+    @app.route('/')
+    def main():
+        return jsonify({"status": "Server running successfully with JWT and Flask"}), 200
+
+    register_blueprints(app)
+    app.cli.add_command(build_snapshots_command)
+    return app
+
+
+def register_blueprints(app):
+    enabled = {name.strip() for name in app.config['ENABLED_BLUEPRINTS'].split(",") if name.strip()}
+    unknown = enabled - {name for _, name in BLUEPRINTS}
+    if unknown:
+        raise ValueError(f"Blueprints desconocidos en ENABLED_BLUEPRINTS: {', '.join(sorted(unknown))}")
+    for module_name, name in BLUEPRINTS:
+        if enabled and name not in enabled:
+            continue
+        blueprint = getattr(importlib.import_module(module_name), name)
+        app.register_blueprint(blueprint, url_prefix="/api")
+
+
+# Comando para cron: flask --app src/app.py build-snapshots [--date YYYY-MM-DD]
+@click.command("build-snapshots")
+@click.option("--date", "day", default=None, help="Día de la foto (por defecto, ayer)")
+@with_appcontext
+def build_snapshots_command(day):
+    from src.stock import build_snapshots
+    day = date.fromisoformat(day) if day else date.today() - timedelta(days=1)
+    if day >= date.today():
+        raise click.BadParameter("solo se pueden generar fotos de días anteriores a hoy", param_hint="--date")
+    for (inventory_id,) in db.session.query(Inventory.id):
+        count = build_snapshots(inventory_id, day)
+        db.session.commit()
+        print(f"Inventario {inventory_id}: {count} productos al {day.isoformat()}")
+
+# Servidor de desarrollo; en producción usar gunicorn (ver gunicorn.conf.py)
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
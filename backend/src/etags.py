@@ -0,0 +1,103 @@
+import hashlib
+from functools import wraps
+from flask import request, make_response
+from sqlalchemy import event, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from src.models import db, CatalogVersion
+from src.tenant import get_current_tenant
+
+# Ámbito de la versión de cada catálogo
+PRODUCTS = "products"          # user_id
+# Solo cambia con código, nombre o categoría (no con el stock): índice de búsqueda
+PRODUCT_SEARCH = "product_search"  # user_id
+UBICACIONES = "ubicaciones"    # inventory_id
+CONFIGURACIONES = "configuraciones"  # user_id
+CATEGORIES = "categories"      # global (0)
+
+GLOBAL_SCOPE = 0
+
+
+def mark_changed(resource, scope_id):
+    """
+    Marca un catálogo como modificado. La versión se incrementa recién después
+    del commit, en una transacción corta aparte, para no mantener bloqueada la
+    fila del contador durante toda la transacción (por ejemplo, en las ventas).
+    """
+    if scope_id is None:
+        return
+    db.session.info.setdefault("catalog_changes", set()).add((resource, int(scope_id)))
+
+
+def _bump(connection, resource, scope_id):
+    table = CatalogVersion.__table__
+    where = (table.c.resource == resource) & (table.c.scope_id == scope_id)
+    result = connection.execute(update(table).where(where).values(version=table.c.version + 1))
+    if result.rowcount:
+        return
+    try:
+        with connection.begin_nested():
+            connection.execute(insert(table).values(resource=resource, scope_id=scope_id, version=1))
+    except IntegrityError:
+        # Otro proceso creó la fila en paralelo
+        connection.execute(update(table).where(where).values(version=table.c.version + 1))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_catalog_changes(session):
+    changes = session.info.pop("catalog_changes", None)
+    if not changes:
+        return
+    try:
+        with session.get_bind().engine.begin() as connection:
+            for resource, scope_id in sorted(changes):
+                _bump(connection, resource, scope_id)
+    except Exception as e:
+        # Los datos ya se confirmaron; solo se pierde la invalidación del ETag
+        print(f"Error al actualizar la versión de catálogos {changes}: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session):
+    session.info.pop("catalog_changes", None)
+
+
+def get_version(resource, scope_id):
+    version = db.session.query(CatalogVersion.version).filter_by(
+        resource=resource, scope_id=scope_id
+    ).scalar()
+    return version or 0
+
+
+def conditional_get(resource, scope):
+    """
+    Agrega un ETag fuerte a una ruta GET de catálogo y responde 304 cuando
+    coincide con If-None-Match, sin ejecutar la consulta ni serializar.
+    `scope` recibe el tenant y retorna el id del ámbito del catálogo.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            tenant = get_current_tenant()
+            if not tenant:
+                return view(*args, **kwargs)
+            scope_id = scope(tenant)
+            if scope_id is None:
+                return view(*args, **kwargs)
+
+            version = get_version(resource, scope_id)
+            # Los parámetros (paginación, filtros) también forman parte del ETag
+            args_hash = hashlib.md5(request.query_string).hexdigest()[:8]
+            etag = f"{resource}-{scope_id}-{version}-{args_hash}"
+
+            if request.if_none_match.contains(etag):
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+        return wrapper
+    return decorator
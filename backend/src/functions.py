@@ -1,15 +1,93 @@
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_request
-import requests
 import os
+import re
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+GOOGLE_CERTS_URL = os.getenv('GOOGLE_CERTS_URL', 'https://www.googleapis.com/oauth2/v1/certs')
+GOOGLE_USERINFO_URL = os.getenv('GOOGLE_USERINFO_URL', 'https://www.googleapis.com/oauth2/v1/userinfo')
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+HTTP_TIMEOUT = 10
+
+# Sesión HTTP compartida: reutiliza las conexiones TCP/TLS hacia Google.
+# requests y google-auth se importan recién al primer uso (solo las rutas de login los necesitan).
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session():
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                import requests
+                _http_session = requests.Session()
+    return _http_session
+
+
+def _max_age(headers):
+    match = re.search(r"max-age=(\d+)", headers.get("Cache-Control", ""))
+    return int(match.group(1)) if match else 0
+
+
+class CachedGoogleRequest:
+    """
+    Transporte de google-auth sobre la sesión compartida que guarda las
+    respuestas GET (los certificados públicos) hasta que vence su Cache-Control max-age.
+    """
+
+    def __init__(self, session=None):
+        self._session = session
+        self._transport = None
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _request(self, *args, **kwargs):
+        if self._transport is None:
+            from google.auth.transport import requests as google_request
+            self._transport = google_request.Request(session=self._session or get_http_session())
+        return self._transport(*args, **kwargs)
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=HTTP_TIMEOUT, **kwargs):
+        if method != "GET" or body is not None:
+            return self._request(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(url)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        response = self._request(url, method=method, headers=headers, timeout=timeout, **kwargs)
+        max_age = _max_age(response.headers)
+        if response.status == 200 and max_age:
+            with self._lock:
+                self._cache[url] = (now + max_age, response)
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+google_auth_request = CachedGoogleRequest()
+
+
+def verify_google_id_token(token):
+    """Verifica un ID token de Google. Lanza ValueError si no es válido."""
+    from google.oauth2 import id_token
+    client_id = os.getenv('VITE_GOOGLE_CLIENT_ID')
+    id_info = id_token.verify_token(token, google_auth_request, audience=client_id, certs_url=GOOGLE_CERTS_URL)
+    if id_info.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError("Wrong issuer")
+    return id_info
+
+
 def verify_google_token(token):
-    client_id =  os.getenv('VITE_GOOGLE_CLIENT_ID')
     try:
-        id_info = id_token.verify_oauth2_token(token, google_request.Request(), client_id)
+        id_info = verify_google_id_token(token)
         return {
             "success": True,
             "user_id": id_info["sub"],
@@ -20,13 +98,9 @@ def verify_google_token(token):
         }
     except ValueError:
         return {"error": False, "message": "Token invalido"}
-    
-def verify_google_access_token(acces_token):
-    url = f"https://www.googleapis.com/oauth2/v1/userinfo?access_token=${acces_token}"
 
-    response = requests.get(url)
-
-    print(f"wenaklo", response)
+def verify_google_access_token(acces_token):
+    response = get_http_session().get(GOOGLE_USERINFO_URL, params={"access_token": acces_token}, timeout=HTTP_TIMEOUT)
 
     if response.status_code == 200:
         return {
@@ -36,5 +110,5 @@ def verify_google_access_token(acces_token):
     else:
         return {
            "Success": False,
-            "message": "Token invalido" 
+            "message": "Token invalido"
         }
\ No newline at end of file
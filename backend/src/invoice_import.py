@@ -0,0 +1,187 @@
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from src.models import db, Invoice, Customer
+from src.sequences import allocate_numbers, COMPROBANTE
+
+# Facturas insertadas por lote
+CHUNK_SIZE = 500
+DEFAULT_TAX = 0.19
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _validate(item):
+    if not isinstance(item, dict):
+        raise ValueError("La factura debe ser un objeto")
+    if "monto_base" not in item:
+        raise ValueError("monto_base is required")
+    try:
+        monto_base = float(item["monto_base"])
+    except (TypeError, ValueError):
+        raise ValueError("monto_base must be a valid number")
+    if "customer_id" in item:
+        try:
+            int(item["customer_id"])
+        except (TypeError, ValueError):
+            raise ValueError("customer_id must be an integer")
+    else:
+        for field in ("customer_name", "customer_email"):
+            if not item.get(field):
+                raise ValueError(f"{field} is required")
+    return monto_base
+
+
+def _existing_customers(pending, user_id):
+    """
+    Clientes ya guardados en una sola pasada: los ids recibidos que son del
+    usuario y los clientes existentes por email. Solo lee.
+    """
+    given_ids = {int(item["customer_id"]) for _, item, _, _ in pending if "customer_id" in item}
+    valid_ids = set()
+    for chunk in _chunks(list(given_ids), CHUNK_SIZE):
+        valid_ids.update(cid for (cid,) in db.session.query(Customer.id).filter(
+            Customer.id.in_(chunk), Customer.user_id == user_id
+        ))
+
+    new_customers = {}
+    for _, item, _, _ in pending:
+        if "customer_id" not in item:
+            new_customers.setdefault(item["customer_email"], item)
+    by_email = {}
+    for chunk in _chunks(list(new_customers), CHUNK_SIZE):
+        for cid, email in db.session.query(Customer.id, Customer.email).filter(
+            Customer.email.in_(chunk), Customer.user_id == user_id
+        ).order_by(Customer.id.desc()):
+            by_email[email] = cid  # el más antiguo queda al final, igual que .first()
+    return valid_ids, by_email
+
+
+def _create_customers(pending, by_email, user_id):
+    """Crea en un solo INSERT los clientes (por email) que aún no existen."""
+    missing = {}
+    for _, item, _, _ in pending:
+        if "customer_id" not in item and item["customer_email"] not in by_email:
+            missing.setdefault(item["customer_email"], {
+                "name": item["customer_name"], "email": item["customer_email"],
+                "phone": item.get("phone", ""), "user_id": user_id,
+            })
+    if missing:
+        created = db.session.execute(
+            insert(Customer).returning(Customer.id, Customer.email), list(missing.values())
+        ).all()
+        by_email.update({email: cid for cid, email in created})
+
+
+def create_invoices(items, tenant, chunk_size=CHUNK_SIZE):
+    """
+    Crea facturas del tenant en lotes con el impuesto de su configuración.
+    Las facturas con error se reportan y no detienen el resto. Todo se confirma
+    en una sola transacción al final.
+    """
+    report = {"created": 0, "failed": 0, "errors": [], "invoices": []}
+    tax = tenant.impuesto if tenant.impuesto is not None else DEFAULT_TAX
+
+    def fail(row_number, numero, message):
+        report["failed"] += 1
+        report["errors"].append({"row": row_number, "numero_comprobante": numero, "error": message})
+
+    pending = []
+    seen = set()
+    for row_number, item in enumerate(items, start=1):
+        try:
+            monto_base = _validate(item)
+        except ValueError as e:
+            fail(row_number, item.get("numero_comprobante") if isinstance(item, dict) else None, str(e))
+            continue
+        numero = item.get("numero_comprobante")
+        if numero:
+            numero = str(numero)
+            if numero in seen:
+                fail(row_number, numero, "numero_comprobante duplicado en el lote")
+                continue
+            seen.add(numero)
+        pending.append([row_number, item, monto_base, numero])
+
+    # Folios ya usados y clientes inválidos se descartan antes de asignar folios,
+    # para que las filas con error no consuman números de la secuencia
+    taken = set()
+    for chunk in _chunks([numero for _, _, _, numero in pending if numero], CHUNK_SIZE):
+        taken.update(numero for (numero,) in db.session.query(Invoice.numero_comprobante).filter(
+            Invoice.numero_comprobante.in_(chunk)
+        ))
+    valid_ids, by_email = _existing_customers(pending, tenant.user_id)
+    accepted = []
+    for entry in pending:
+        row_number, item, _, numero = entry
+        if numero in taken:
+            fail(row_number, numero, "numero_comprobante ya existe")
+        elif "customer_id" in item and int(item["customer_id"]) not in valid_ids:
+            fail(row_number, numero, "Cliente no encontrado")
+        else:
+            accepted.append(entry)
+    pending = accepted
+
+    # Folios para las facturas que no traen uno, reservados de una vez
+    # (antes de cualquier escritura, porque el contador usa su propia transacción)
+    without_numero = [entry for entry in pending if not entry[3]]
+    for entry, numero in zip(without_numero, allocate_numbers(tenant.user_id, COMPROBANTE, len(without_numero))):
+        entry[3] = numero
+
+    _create_customers(pending, by_email, tenant.user_id)
+
+    for chunk in _chunks(pending, chunk_size):
+        rows = []
+        for row_number, item, monto_base, numero in chunk:
+            if "customer_id" in item:
+                customer_id = int(item["customer_id"])
+            else:
+                customer_id = by_email[item["customer_email"]]
+            impuesto_aplicado = monto_base * tax
+            rows.append((row_number, {
+                "user_id": tenant.user_id,
+                "inventory_id": tenant.inventory_id,
+                "customer_id": customer_id,
+                "monto_base": monto_base,
+                "impuesto_aplicado": impuesto_aplicado,
+                "total_final": monto_base + impuesto_aplicado,
+                "status": item.get("status", "Pending"),
+                "numero_comprobante": numero,
+                "tipo": item.get("tipo", "Factura"),
+                "hidden": bool(item.get("hidden", False)),
+            }))
+        if not rows:
+            continue
+
+        try:
+            with db.session.begin_nested():
+                created = db.session.execute(
+                    insert(Invoice).returning(Invoice.id, Invoice.numero_comprobante),
+                    [values for _, values in rows]
+                ).all()
+            ids = {numero: invoice_id for invoice_id, numero in created}
+            inserted = rows
+        except IntegrityError:
+            # Conflicto concurrente en el lote: se reintenta cada factura por separado
+            ids, inserted = {}, []
+            for row_number, values in rows:
+                try:
+                    with db.session.begin_nested():
+                        invoice_id = db.session.execute(insert(Invoice).returning(Invoice.id), values).scalar_one()
+                except IntegrityError as e:
+                    fail(row_number, values["numero_comprobante"], f"Error al guardar la factura: {e.orig}")
+                    continue
+                ids[values["numero_comprobante"]] = invoice_id
+                inserted.append((row_number, values))
+
+        report["created"] += len(inserted)
+        report["invoices"].extend(
+            {"row": row_number, "id": ids[values["numero_comprobante"]], "numero_comprobante": values["numero_comprobante"]}
+            for row_number, values in inserted
+        )
+
+    db.session.commit()
+    report["errors"].sort(key=lambda error: error["row"])
+    return report
@@ -0,0 +1,128 @@
+import os
+import queue
+import threading
+import time
+
+# Mensajes que un worker envía por la misma conexión SMTP antes de volver a esperar
+BATCH_SIZE = 50
+
+
+class MailDispatcher:
+    """
+    Envío de correos en segundo plano.
+
+    Los mensajes se encolan en una cola acotada del proceso y uno o más workers
+    los envían reutilizando su conexión SMTP mientras haya mensajes pendientes,
+    con reintentos y espera exponencial ante errores.
+
+    Configuración:
+      - MAIL_ASYNC: False envía en el mismo request (útil en pruebas)
+      - MAIL_QUEUE_SIZE, MAIL_WORKERS, MAIL_MAX_RETRIES, MAIL_RETRY_BACKOFF
+    Con MAIL_SUPPRESS_SEND=True Flask-Mail no abre conexiones SMTP y solo emite
+    la señal flask_mail.email_dispatched (útil para capturar los correos en pruebas).
+    Flask-Mail se importa e inicializa recién con el primer envío.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MAIL_ASYNC', True)
+        app.config.setdefault('MAIL_QUEUE_SIZE', 1000)
+        app.config.setdefault('MAIL_WORKERS', 1)
+        app.config.setdefault('MAIL_MAX_RETRIES', 3)
+        app.config.setdefault('MAIL_RETRY_BACKOFF', 2.0)
+        self.app = app
+        self._queue = queue.Queue(maxsize=app.config['MAIL_QUEUE_SIZE'])
+        app.extensions['mail_dispatcher'] = self
+
+    def send(self, message):
+        """Encola un mensaje. Retorna False si la cola está llena."""
+        if not self.app.config['MAIL_ASYNC']:
+            self._deliver([message])
+            return True
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            return False
+        return True
+
+    def _mail_state(self):
+        state = self.app.extensions.get('mail')
+        if state is None:
+            with self._lock:
+                state = self.app.extensions.get('mail')
+                if state is None:
+                    from flask_mail import Mail
+                    Mail(self.app)
+                    state = self.app.extensions['mail']
+        return state
+
+    def join(self):
+        """Espera a que se procesen todos los mensajes encolados."""
+        self._queue.join()
+
+    def _ensure_workers(self):
+        # Los hilos no sobreviven a un fork (workers de gunicorn): se inician por proceso
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._threads = []
+            for i in range(self.app.config['MAIL_WORKERS']):
+                thread = threading.Thread(target=self._worker, name=f"mail-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._pid = os.getpid()
+
+    def _worker(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self.app.app_context():
+                    self._deliver(batch)
+            except Exception as e:
+                print(f"Error en el envío de correos: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _deliver(self, batch):
+        from flask_mail import Connection
+        state = self._mail_state()
+        max_retries = self.app.config['MAIL_MAX_RETRIES']
+        backoff = self.app.config['MAIL_RETRY_BACKOFF']
+        pending = list(batch)
+        attempts = 0
+        while pending:
+            try:
+                # Una sola conexión SMTP para todos los mensajes pendientes
+                with Connection(state) as connection:
+                    while pending:
+                        connection.send(pending[0])
+                        pending.pop(0)
+                        attempts = 0
+            except Exception as e:
+                attempts += 1
+                if attempts > max_retries:
+                    message = pending.pop(0)
+                    print(f"No se pudo enviar el correo a {message.recipients}: {e}")
+                    attempts = 0
+                    continue
+                time.sleep(backoff * 2 ** (attempts - 1))
+
+
+mail_dispatcher = MailDispatcher()
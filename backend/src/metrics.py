@@ -0,0 +1,184 @@
+import bisect
+import threading
+import time
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Límites superiores de cada bucket de los histogramas
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(labels, le=bound)} {cumulative}')
+        lines.append(f'{name}_sum{_labels(labels)} {self.sum}')
+        lines.append(f'{name}_count{_labels(labels)} {self.count}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+class Metrics:
+    """
+    Métricas por endpoint: latencia, consultas SQL, tiempo en la base de datos y
+    tamaño de las respuestas, expuestas en formato de texto de Prometheus en /metrics.
+
+    Los valores son por proceso (cada worker de gunicorn expone los suyos).
+    Con SLOW_QUERY_MS > 0 se imprime cada consulta que tarde más que ese umbral.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._requests = {}        # (endpoint, method, status) -> cantidad
+        self._latency = {}         # (endpoint, method) -> Histogram
+        self._queries = {}         # endpoint -> Histogram de consultas por request
+        self._db_seconds = {}      # endpoint -> segundos en la base de datos
+        self._response_size = {}   # endpoint -> Histogram
+        self._slow_queries = 0
+        self._collectors = []
+        self.slow_query_ms = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('SLOW_QUERY_MS', 0)
+        if not app.config['METRICS_ENABLED']:
+            return
+        self.slow_query_ms = app.config['SLOW_QUERY_MS']
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view, methods=['GET'])
+        app.extensions['metrics'] = self
+
+    def register_collector(self, collector):
+        """
+        Agrega métricas de otros módulos (por ejemplo, cachés). `collector` no recibe
+        argumentos y retorna una lista de (nombre, tipo, ayuda, [(labels, valor)]).
+        """
+        self._collectors.append(collector)
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_db_seconds = 0.0
+
+    def _after_request(self, response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or "unmatched"
+        method = request.method
+        # Las respuestas en streaming (exportaciones) no tienen largo conocido
+        size = response.calculate_content_length() if not response.is_streamed else None
+
+        with self._lock:
+            key = (endpoint, method, response.status_code)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._latency.setdefault((endpoint, method), Histogram(LATENCY_BUCKETS)).observe(elapsed)
+            self._queries.setdefault(endpoint, Histogram(QUERY_BUCKETS)).observe(g.get('metrics_queries', 0))
+            self._db_seconds[endpoint] = self._db_seconds.get(endpoint, 0.0) + g.get('metrics_db_seconds', 0.0)
+            if size is not None:
+                self._response_size.setdefault(endpoint, Histogram(SIZE_BUCKETS)).observe(size)
+        return response
+
+    def record_query(self, statement, elapsed):
+        if not has_request_context() or 'metrics_start' not in g:
+            return
+        g.metrics_queries += 1
+        g.metrics_db_seconds += elapsed
+        if self.slow_query_ms and elapsed * 1000 >= self.slow_query_ms:
+            with self._lock:
+                self._slow_queries += 1
+            print(f"Consulta lenta ({elapsed * 1000:.1f} ms) en {request.endpoint}: {' '.join(statement.split())}")
+
+    def render(self):
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            header("http_requests_total", "counter", "Requests atendidos por endpoint, método y estado")
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{_labels([("endpoint", endpoint), ("method", method), ("status", status)])} {count}')
+
+            header("http_request_duration_seconds", "histogram", "Latencia de los requests")
+            for (endpoint, method), histogram in sorted(self._latency.items()):
+                lines.extend(histogram.render("http_request_duration_seconds", [("endpoint", endpoint), ("method", method)]))
+
+            header("http_request_db_queries", "histogram", "Consultas SQL por request")
+            for endpoint, histogram in sorted(self._queries.items()):
+                lines.extend(histogram.render("http_request_db_queries", [("endpoint", endpoint)]))
+
+            header("http_request_db_seconds_total", "counter", "Tiempo total en la base de datos")
+            for endpoint, seconds in sorted(self._db_seconds.items()):
+                lines.append(f'http_request_db_seconds_total{_labels([("endpoint", endpoint)])} {seconds}')
+
+            header("http_response_size_bytes", "histogram", "Tamaño de las respuestas")
+            for endpoint, histogram in sorted(self._response_size.items()):
+                lines.extend(histogram.render("http_response_size_bytes", [("endpoint", endpoint)]))
+
+            header("db_slow_queries_total", "counter", "Consultas que superaron SLOW_QUERY_MS")
+            lines.append(f"db_slow_queries_total {self._slow_queries}")
+
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                header(name, kind, help_text)
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def metrics_view(self):
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+
+metrics = Metrics()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_start(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_end(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if starts:
+        metrics.record_query(statement, time.perf_counter() - starts.pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def _query_error(context):
+    starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, DDL
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token
 import datetime
@@ -52,6 +53,10 @@ class Inventory(db.Model):
         db.session.add(self)
         db.session.commit()
 
+    def delete(self):
+        db.session.delete(self)
+        db.session.commit()
+
 # Tabla users
 class User(db.Model):
     __tablename__ = 'users'
@@ -82,7 +87,8 @@ class User(db.Model):
     # Relación: clientes creados por el usuario
     customers = db.relationship("Customer", backref="creator", lazy=True)
 
-    def serialize(self):
+    # Solo columnas propias, sin relaciones (no genera consultas extra)
+    def serialize_summary(self):
         return {
             "id": self.id,
             "email": self.email,
@@ -91,10 +97,15 @@ class User(db.Model):
             "role": self.role,
             "is_active": self.is_active,
             "created_by": self.created_by,
-            "profile": self.profile.serialize() if self.profile else None,
-            "inventory": self.inventory.serialize() if self.inventory else None,
-            "customers": [customer.serialize() for customer in self.customers]
         }
+
+    # Detalle de tamaño constante: perfil e inventario (uno a uno).
+    # Los clientes se consultan paginados en /api/customers.
+    def serialize(self):
+        data = self.serialize_summary()
+        data["profile"] = self.profile.serialize() if self.profile else None
+        data["inventory"] = self.inventory.serialize() if self.inventory else None
+        return data
     
     def save(self):
         db.session.add(self)
@@ -175,6 +186,9 @@ class Profile(db.Model):
 # Nuevo modelo: Tabla de Customers
 class Customer(db.Model):
     __tablename__ = 'customers'
+    __table_args__ = (
+        db.Index('ix_customers_user_id_email', 'user_id', 'email'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -211,6 +225,15 @@ class Customer(db.Model):
 # Tabla de productos
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        db.Index('ix_products_user_id', 'user_id'),
+        db.Index('ix_products_inventory_id', 'inventory_id'),
+        # Búsqueda (/api/products/search): índices trigram de pg_trgm, solo en Postgres
+        db.Index('ix_products_codigo_trgm', 'codigo',
+                 postgresql_using='gin', postgresql_ops={'codigo': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        db.Index('ix_products_nombre_trgm', 'nombre',
+                 postgresql_using='gin', postgresql_ops={'nombre': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     codigo = db.Column(db.String(50), unique=True, nullable=False)
@@ -249,17 +272,64 @@ class Product(db.Model):
 
     
 
+# Los índices trigram necesitan la extensión (en migraciones: op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+event.listen(
+    Product.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+# Cabecera de una venta con varios productos (checkout); cada línea es una fila de Sale
+class SaleOrder(db.Model):
+    __tablename__ = 'sale_orders'
+    __table_args__ = (
+        db.Index('ix_sale_orders_user_id_order_date', 'user_id', 'order_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    inventory_id = db.Column(db.Integer, db.ForeignKey('inventories.id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=True)
+    total = db.Column(db.Float, nullable=False)
+    order_date = db.Column(db.DateTime, server_default=db.func.now())
+
+    customer = db.relationship("Customer", lazy=True)
+    lines = db.relationship("Sale", backref="order", lazy=True)
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "inventory_id": self.inventory_id,
+            "customer_id": self.customer_id,
+            "total": self.total,
+            "order_date": self.order_date.isoformat() if self.order_date else None
+        }
+
 # Tabla de ventas (Sale)
 class Sale(db.Model):
     __tablename__ = 'sales'
+    __table_args__ = (
+        db.Index('ix_sales_user_id_sale_date', 'user_id', 'sale_date'),
+        db.Index('ix_sales_product_id', 'product_id'),
+        db.Index('ix_sales_order_id', 'order_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     inventory_id = db.Column(db.Integer, db.ForeignKey('inventories.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=True)
+    # Venta con varios productos a la que pertenece esta línea (None en ventas individuales)
+    order_id = db.Column(db.Integer, db.ForeignKey('sale_orders.id'), nullable=True)
     quantity = db.Column(db.Integer, nullable=False)
     total = db.Column(db.Float, nullable=False)
     sale_date = db.Column(db.DateTime, server_default=db.func.now())
+
+    # Relaciones (cargadas con joinedload en el listado de ventas)
+    product = db.relationship("Product", lazy=True)
+    customer = db.relationship("Customer", lazy=True)
+    # Movimientos de stock que generó la venta (vacío en ventas anteriores al libro de stock)
+    movements = db.relationship("Movement", backref="sale", lazy=True)
     
     def serialize(self):
         return {
@@ -267,6 +337,8 @@ class Sale(db.Model):
             "user_id": self.user_id,
             "inventory_id": self.inventory_id,
             "product_id": self.product_id,
+            "customer_id": self.customer_id,
+            "order_id": self.order_id,
             "quantity": self.quantity,
             "total": self.total,
             "sale_date": self.sale_date.isoformat() if self.sale_date else None
@@ -297,11 +369,16 @@ class Sale(db.Model):
 # Tabla de facturas (Invoice)
 class Invoice(db.Model):
     __tablename__ = 'invoices'
+    __table_args__ = (
+        db.Index('ix_invoices_user_id_invoice_date', 'user_id', 'invoice_date'),
+        db.Index('ix_invoices_customer_id', 'customer_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     inventory_id = db.Column(db.Integer, db.ForeignKey('inventories.id'), nullable=False)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
+    # Las facturas de compra (purchase_id) no tienen cliente
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=True)
     purchase_id = db.Column(db.Integer, db.ForeignKey('purchases.id'), nullable=True, unique=True)
     numero_comprobante = db.Column(db.String(50), nullable=False, unique=True)
     numero_nota = db.Column(db.String(50), nullable=True, unique=True)
@@ -361,6 +438,10 @@ class Invoice(db.Model):
 # Tabla de compras
 class Purchase(db.Model):
     __tablename__ = 'purchases'
+    __table_args__ = (
+        db.Index('ix_purchases_inventory_id_purchase_date', 'inventory_id', 'purchase_date'),
+        db.Index('ix_purchases_product_id', 'product_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     orden_compra = db.Column(db.String(50), nullable=False, unique=True )
@@ -379,7 +460,8 @@ class Purchase(db.Model):
     products = db.relationship("Product", backref="purchases", lazy=True)
 
     movements = db.relationship("Movement", backref="purchases", lazy=True)
-    invoice = db.relationship("Invoice", backref="purchases", lazy=True)
+    # Una compra tiene a lo más una factura (invoices.purchase_id es único)
+    invoice = db.relationship("Invoice", backref="purchases", lazy=True, uselist=False)
     
     def serialize(self):
         return {
@@ -387,16 +469,16 @@ class Purchase(db.Model):
             "orden_compra": self.orden_compra,
             "metodo": self.metodo,
             "provider": self.provider.serialize() if self.provider else None ,
-            "product": self.products.serialize() if self.provider else None ,
-            "inventory": self.inventory.serialize() if self.provider else None ,
+            "product": self.products.serialize() if self.products else None ,
+            "inventory": self.inventory.serialize() if self.inventory else None ,
             "provider_id": self.provider_id,
             "product_id": self.product_id,
             "inventory_id": self.inventory_id,
             "quantity": self.quantity,
             "total": self.total,
             "purchase_date": self.purchase_date.isoformat() if self.purchase_date else None,
-            "movements": self.movements.serialize() if self.provider else None ,
-            "invoice": self.invoice.serialize() if self.provider else None 
+            "movements": [movement.serialize() for movement in self.movements],
+            "invoice": self.invoice.serialize() if self.invoice else None 
         }
     
     def save(self):
@@ -424,6 +506,10 @@ class Purchase(db.Model):
 # Tabla de proveedores
 class Provider(db.Model):
     __tablename__ = 'providers'
+    __table_args__ = (
+        # Listado por inventario ordenado por nombre (/api/providers)
+        db.Index('ix_providers_inventory_id_name', 'inventory_id', 'name'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -467,18 +553,37 @@ class Provider(db.Model):
     def get_all(cls):
         return cls.query.all()
 
+# Búsqueda por prefijo sin distinguir mayúsculas (?q=): lower(columna) LIKE 'x%'.
+# text_pattern_ops permite usar el índice con LIKE en Postgres con cualquier collation
+db.Index('ix_providers_inventory_id_lower_name', Provider.inventory_id, db.func.lower(Provider.name).label('lower_name'),
+         postgresql_ops={'lower_name': 'text_pattern_ops'})
+db.Index('ix_providers_inventory_id_lower_rut', Provider.inventory_id, db.func.lower(Provider.rut).label('lower_rut'),
+         postgresql_ops={'lower_rut': 'text_pattern_ops'})
+
 # Tabla de movimientos
 class Movement(db.Model):
     __tablename__ = 'movements'
+    __table_args__ = (
+        db.Index('ix_movements_inventory_id_product_id_date', 'inventory_id', 'product_id', 'date'),
+        db.Index('ix_movements_inventory_id_date', 'inventory_id', 'date'),
+        db.Index('ix_movements_product_id', 'product_id'),
+        db.Index('ix_movements_sale_id', 'sale_id'),
+        db.Index('ix_movements_reverses_id', 'reverses_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     inventory_id = db.Column(db.Integer, db.ForeignKey('inventories.id'), nullable=False)
     type = db.Column(db.String(50), nullable=False)  # Ejemplo: 'venta', 'compra', 'ingreso'
     quantity = db.Column(db.Integer, nullable=False)
+    # Stock del producto después de aplicar este movimiento (saldo acumulado)
+    balance = db.Column(db.Integer, nullable=True)
     date = db.Column(db.DateTime, server_default=db.func.now())
     
     purchase_id = db.Column(db.Integer, db.ForeignKey('purchases.id'), nullable=True)
+    sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), nullable=True)
+    # Ajuste que anula otro movimiento (el libro de stock no se edita ni se borra)
+    reverses_id = db.Column(db.Integer, db.ForeignKey('movements.id'), nullable=True)
 
     registered_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     
@@ -493,6 +598,8 @@ class Movement(db.Model):
             "inventory_id": self.inventory_id,
             "type": self.type,
             "quantity": self.quantity,
+            "balance": self.balance,
+            "reverses_id": self.reverses_id,
             "date": self.date.isoformat() if self.date else None,
             "registered_by": {
                 "name": f"{self.registered_by_user.first_name} {self.registered_by_user.last_name}" if self.registered_by_user else None,
@@ -524,9 +631,35 @@ class Movement(db.Model):
     def get_all(cls):
         return cls.query.all()
 
+# Foto diaria del stock de cada producto (stock al final de snapshot_date)
+class StockSnapshot(db.Model):
+    __tablename__ = 'stock_snapshots'
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'snapshot_date', name='uq_stock_snapshots_product_id_snapshot_date'),
+        db.Index('ix_stock_snapshots_inventory_id_snapshot_date', 'inventory_id', 'snapshot_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    inventory_id = db.Column(db.Integer, db.ForeignKey('inventories.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    snapshot_date = db.Column(db.Date, nullable=False)
+    stock = db.Column(db.Integer, nullable=False)
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "inventory_id": self.inventory_id,
+            "product_id": self.product_id,
+            "snapshot_date": self.snapshot_date.isoformat(),
+            "stock": self.stock
+        }
+
 # Nueva tabla: Ubicaciones
 class Ubicacion(db.Model):
     __tablename__ = 'ubicaciones'
+    __table_args__ = (
+        db.Index('ix_ubicaciones_inventory_id', 'inventory_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
@@ -553,6 +686,32 @@ class Ubicacion(db.Model):
         db.session.delete(self)
         db.session.commit()
 
+# Versión por tenant de los catálogos, usada para los ETag de las rutas GET
+class CatalogVersion(db.Model):
+    __tablename__ = 'catalog_versions'
+    __table_args__ = (
+        db.UniqueConstraint('resource', 'scope_id', name='uq_catalog_versions_resource_scope_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    resource = db.Column(db.String(50), nullable=False)
+    # user_id o inventory_id según el recurso (0 para catálogos globales)
+    scope_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+# Contador de folios por usuario y tipo de documento (ver src/sequences.py)
+class DocumentSequence(db.Model):
+    __tablename__ = 'document_sequences'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'doc_type', name='uq_document_sequences_user_id_doc_type'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    doc_type = db.Column(db.String(20), nullable=False)
+    # Próximo número sin asignar
+    next_value = db.Column(db.Integer, nullable=False, default=1)
+
 class Configuration(db.Model):
     __tablename__ = 'configurations'
     
@@ -0,0 +1,147 @@
+import base64
+import json
+from datetime import date, datetime
+from flask import request, jsonify
+from sqlalchemy import and_, or_
+
+# Límite máximo de filas por página
+MAX_LIMIT = 500
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def _encode_cursor(sort, value, last_id):
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, last_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+        return sort, value, int(last_id)
+    except Exception:
+        raise PaginationError("cursor inválido")
+
+
+def _coerce(column, raw):
+    """Convierte un valor recibido como texto al tipo python de la columna."""
+    if raw is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return raw
+    if isinstance(raw, python_type):
+        return raw
+    try:
+        if python_type is bool:
+            return str(raw).lower() in ("1", "true", "yes", "si")
+        if python_type is datetime:
+            return datetime.fromisoformat(raw)
+        if python_type is date:
+            return date.fromisoformat(raw)
+        return python_type(raw)
+    except (TypeError, ValueError):
+        raise PaginationError(f"valor inválido para {column.key}: {raw}")
+
+
+def _after(column, value, pk, last_id, descending):
+    """Filas posteriores al cursor (value, last_id); NULL se ordena como mayor que todo valor."""
+    if descending:
+        if value is None:
+            return or_(and_(column.is_(None), pk < last_id), column.is_not(None))
+        return or_(column < value, and_(column == value, pk < last_id))
+    if value is None:
+        return and_(column.is_(None), pk > last_id)
+    return or_(column > value, and_(column == value, pk > last_id), column.is_(None))
+
+
+def paginate(query, model, sortable=("id",), filterable=(), default_sort="id"):
+    """
+    Aplica filtros simples, orden y paginación por cursor (keyset) a una consulta.
+
+    Parámetros de la URL:
+      - limit: cantidad de filas por página (máximo MAX_LIMIT)
+      - cursor: valor devuelto en X-Next-Cursor por la página anterior
+      - sort: campo de orden, con prefijo "-" para orden descendente
+      - <campo>=<valor>: igualdad sobre los campos permitidos en `filterable`
+
+    Sin limit ni cursor se devuelven todas las filas (compatibilidad con el frontend).
+    Retorna (items, next_cursor).
+    """
+    args = request.args
+
+    for field in filterable:
+        if field in args:
+            column = getattr(model, field)
+            query = query.filter(column == _coerce(column, args.get(field)))
+
+    sort = args.get("sort", default_sort)
+    field = sort.lstrip("-")
+    if field not in sortable:
+        raise PaginationError(f"No se puede ordenar por '{field}'")
+    descending = sort.startswith("-")
+    column = getattr(model, field)
+    pk = model.id
+
+    cursor = args.get("cursor")
+    raw_limit = args.get("limit")
+    if cursor:
+        cursor_sort, value, last_id = _decode_cursor(cursor)
+        if cursor_sort != sort:
+            raise PaginationError("El cursor no corresponde al orden solicitado")
+        if field == "id":
+            query = query.filter(pk < last_id if descending else pk > last_id)
+        else:
+            query = query.filter(_after(column, _coerce(column, value), pk, last_id, descending))
+
+    if field == "id":
+        query = query.order_by(pk.desc() if descending else pk.asc())
+    else:
+        # NULL va al final en orden ascendente y al inicio en descendente (el orden por
+        # defecto de Postgres, que usa los mismos índices); explícito para que SQLite coincida
+        query = query.order_by(
+            column.desc().nulls_first() if descending else column.asc().nulls_last(),
+            pk.desc() if descending else pk.asc()
+        )
+
+    if raw_limit is None and cursor is None:
+        return query.all(), None
+
+    try:
+        limit = int(raw_limit) if raw_limit is not None else MAX_LIMIT
+    except ValueError:
+        raise PaginationError("limit debe ser un número entero")
+    if limit < 1:
+        raise PaginationError("limit debe ser mayor que 0")
+    limit = min(limit, MAX_LIMIT)
+
+    # Se pide una fila extra para saber si existe una página siguiente
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_cursor(sort, getattr(last, field), last.id)
+    return rows, next_cursor
+
+
+def paginated_response(query, model, serialize=None, **options):
+    """
+    Respuesta JSON paginada: el cuerpo sigue siendo un arreglo y el cursor
+    de la página siguiente se envía en la cabecera X-Next-Cursor.
+    """
+    try:
+        items, next_cursor = paginate(query, model, **options)
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    serialize = serialize or (lambda item: item.serialize())
+    response = jsonify([serialize(item) for item in items])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload
+from src.models import db, Product
+from src.metrics import metrics
+
+# Caché LRU del proceso: (user_id, codigo) -> (expira_en, producto serializado)
+_cache = OrderedDict()
+_lock = threading.Lock()
+# Aumenta con cada invalidación: una lectura que empezó antes no guarda un valor viejo
+_generation = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+
+def get_product_by_code(user_id, codigo):
+    """
+    Producto serializado por código (lectura a través de la caché) o None.
+    PRODUCT_CACHE_TTL = 0 desactiva la caché.
+    """
+    ttl = current_app.config.get("PRODUCT_CACHE_TTL", 0)
+    max_entries = current_app.config.get("PRODUCT_CACHE_SIZE", 10000)
+    key = (int(user_id), codigo)
+    now = time.monotonic()
+
+    if ttl:
+        with _lock:
+            entry = _cache.get(key)
+            if entry and entry[0] > now:
+                _cache.move_to_end(key)
+                _stats["hits"] += 1
+                return entry[1]
+            _stats["misses"] += 1
+            generation = _generation
+
+    product = (
+        Product.query.options(joinedload(Product.ubicacion))
+        .filter_by(user_id=user_id, codigo=codigo)
+        .first()
+    )
+    if product is None:
+        return None
+    data = product.serialize()
+
+    if ttl:
+        with _lock:
+            if generation == _generation:
+                _cache[key] = (now + ttl, data)
+                _cache.move_to_end(key)
+                while len(_cache) > max_entries:
+                    _cache.popitem(last=False)
+                    _stats["evictions"] += 1
+    return data
+
+
+def mark_product_changed(user_id, codigo=None):
+    """
+    Descarta el producto de la caché después del commit (sin `codigo`, todos los
+    productos del usuario). Se usa al editar, eliminar o mover stock.
+    """
+    if user_id is None:
+        return
+    db.session.info.setdefault("product_cache_keys", set()).add((int(user_id), codigo))
+
+
+def invalidate(keys):
+    global _generation
+    with _lock:
+        _generation += 1
+        for user_id, codigo in keys:
+            if codigo is None:
+                stale = [key for key in _cache if key[0] == user_id]
+            else:
+                stale = [(user_id, codigo)] if (user_id, codigo) in _cache else []
+            for key in stale:
+                del _cache[key]
+            _stats["invalidations"] += len(stale)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    keys = session.info.pop("product_cache_keys", None)
+    if keys:
+        invalidate(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_keys(session):
+    session.info.pop("product_cache_keys", None)
+
+
+def _collect():
+    with _lock:
+        stats = dict(_stats, entries=len(_cache))
+    return [
+        ("product_code_cache_hits_total", "counter", "Búsquedas por código resueltas desde la caché",
+         [((), stats["hits"])]),
+        ("product_code_cache_misses_total", "counter", "Búsquedas por código que consultaron la base de datos",
+         [((), stats["misses"])]),
+        ("product_code_cache_evictions_total", "counter", "Entradas descartadas por tamaño (LRU)",
+         [((), stats["evictions"])]),
+        ("product_code_cache_invalidations_total", "counter", "Entradas descartadas por cambios en el producto",
+         [((), stats["invalidations"])]),
+        ("product_code_cache_entries", "gauge", "Entradas en la caché", [((), stats["entries"])]),
+    ]
+
+
+metrics.register_collector(_collect)
@@ -0,0 +1,206 @@
+import csv
+import io
+from itertools import islice
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from src.models import db, Product, Movement, Ubicacion
+from src.stock import apply_stock_change, StockError
+
+# Filas validadas y escritas por lote
+CHUNK_SIZE = 500
+
+REQUIRED_FIELDS = ("nombre", "codigo", "stock", "precio", "categoria")
+
+
+def _normalize(row):
+    # Encabezados en minúscula y sin espacios, igual que FileImport.jsx
+    return {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+
+
+def iter_csv(stream):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    for row in csv.DictReader(text):
+        yield _normalize(row)
+
+
+def iter_xlsx(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("La importación de XLSX requiere el paquete openpyxl")
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    rows = workbook.worksheets[0].iter_rows(values_only=True)
+    headers = next(rows, None)
+    if not headers:
+        return
+    for values in rows:
+        if values is None or all(v is None for v in values):
+            continue
+        yield _normalize(dict(zip(headers, values)))
+
+
+def iter_upload(file_storage):
+    """Lee un archivo subido (CSV o XLSX) fila por fila, sin cargarlo entero en memoria."""
+    filename = (file_storage.filename or "").lower()
+    if filename.endswith(".xlsx"):
+        return iter_xlsx(file_storage.stream)
+    if filename.endswith(".csv") or file_storage.mimetype == "text/csv":
+        return iter_csv(file_storage.stream)
+    raise ValueError("Formato no soportado, use .csv o .xlsx")
+
+
+def _validate(row, ubicacion_ids):
+    missing = [f for f in REQUIRED_FIELDS if row.get(f) in (None, "")]
+    if missing:
+        raise ValueError(f"Campos faltantes: {', '.join(missing)}")
+    try:
+        precio = float(row["precio"])
+        stock = int(float(row["stock"]))
+    except (TypeError, ValueError):
+        raise ValueError("precio y stock deben ser numéricos")
+    if precio < 0 or stock < 0:
+        raise ValueError("precio y stock no pueden ser negativos")
+    values = {
+        "codigo": str(row["codigo"]).strip(),
+        "nombre": str(row["nombre"]).strip(),
+        "precio": precio,
+        "stock": stock,
+        "categoria": str(row["categoria"]).strip(),
+    }
+    # Sin la columna ubicacion_id se conserva la ubicación actual del producto
+    if "ubicacion_id" in row:
+        ubicacion_id = row["ubicacion_id"]
+        if ubicacion_id in (None, ""):
+            ubicacion_id = None
+        else:
+            try:
+                ubicacion_id = int(ubicacion_id)
+            except (TypeError, ValueError):
+                raise ValueError("ubicacion_id inválido")
+            if ubicacion_id not in ubicacion_ids:
+                raise ValueError("Ubicación no encontrada")
+        values["ubicacion_id"] = ubicacion_id
+    return values
+
+
+def _movement(product_id, inventory_id, user_id, movement_type, quantity, balance):
+    return {
+        "product_id": product_id,
+        "inventory_id": inventory_id,
+        "type": movement_type,
+        "quantity": quantity,
+        "balance": balance,
+        "registered_by": user_id,
+    }
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    start = 1
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def import_products(rows, user_id, inventory_id, chunk_size=CHUNK_SIZE):
+    """
+    Inserta o actualiza (por codigo) productos del usuario en lotes.
+    Las filas con error se reportan y no detienen el resto de la importación.
+    Todo se confirma en una sola transacción al final.
+    """
+    report = {"created": 0, "updated": 0, "failed": 0, "errors": []}
+    ubicacion_ids = {
+        uid for (uid,) in db.session.query(Ubicacion.id).filter_by(inventory_id=inventory_id)
+    }
+    seen = set()
+
+    def fail(row_number, codigo, message):
+        report["failed"] += 1
+        report["errors"].append({"row": row_number, "codigo": codigo, "error": message})
+
+    for start, chunk in _chunks(rows, chunk_size):
+        valid = {}
+        for offset, row in enumerate(chunk):
+            row_number = start + offset
+            if not isinstance(row, dict):
+                fail(row_number, None, "La fila debe ser un objeto")
+                continue
+            row = _normalize(row)
+            try:
+                values = _validate(row, ubicacion_ids)
+            except ValueError as e:
+                fail(row_number, row.get("codigo"), str(e))
+                continue
+            if values["codigo"] in seen:
+                fail(row_number, values["codigo"], "Código duplicado en la importación")
+                continue
+            seen.add(values["codigo"])
+            valid[values["codigo"]] = (row_number, values)
+
+        if not valid:
+            continue
+
+        # Una consulta por lote para separar inserciones de actualizaciones
+        existing = db.session.query(Product.codigo, Product.id, Product.user_id, Product.stock).filter(
+            Product.codigo.in_(list(valid))
+        ).all()
+        to_update = []
+        adjustments = []
+        for codigo, product_id, owner_id, current_stock in existing:
+            row_number, values = valid.pop(codigo)
+            if str(owner_id) != str(user_id):
+                fail(row_number, codigo, "El código pertenece a otro usuario")
+                continue
+            # El stock no se sobrescribe: la diferencia se aplica como ajuste del libro de stock
+            values = dict(values, id=product_id)
+            delta = values.pop("stock") - current_stock
+            to_update.append((row_number, values))
+            if delta:
+                adjustments.append((row_number, codigo, product_id, delta))
+        to_insert = [
+            (row_number, dict({"ubicacion_id": None}, **values, user_id=user_id, inventory_id=inventory_id))
+            for row_number, values in valid.values()
+        ]
+
+        try:
+            with db.session.begin_nested():
+                movements = []
+                # stock = stock + delta con el UPDATE protegido del libro: una venta confirmada
+                # desde la lectura anterior no se pierde
+                for row_number, codigo, product_id, delta in adjustments:
+                    try:
+                        balance = apply_stock_change(product_id, delta, inventory_id=inventory_id)
+                    except StockError as e:
+                        fail(row_number, codigo, str(e))
+                        to_update = [entry for entry in to_update if entry[1]["id"] != product_id]
+                        continue
+                    movements.append(_movement(product_id, inventory_id, user_id, "ajuste", delta, balance))
+                if to_insert:
+                    created = db.session.execute(
+                        insert(Product).returning(Product.id, Product.stock),
+                        [values for _, values in to_insert]
+                    ).all()
+                    movements.extend(
+                        _movement(product_id, inventory_id, user_id, "ingreso", stock, stock)
+                        for product_id, stock in created if stock
+                    )
+                if to_update:
+                    db.session.execute(update(Product), [values for _, values in to_update])
+                # El stock importado queda registrado en el historial de movimientos
+                if movements:
+                    db.session.execute(insert(Movement), movements)
+        except IntegrityError as e:
+            # Conflicto concurrente en el lote: se reporta el lote completo
+            for row_number, values in to_insert + to_update:
+                fail(row_number, values["codigo"], f"Error al guardar el lote: {e.orig}")
+            continue
+
+        report["created"] += len(to_insert)
+        report["updated"] += len(to_update)
+
+    db.session.commit()
+    report["errors"].sort(key=lambda error: error["row"])
+    return report
@@ -0,0 +1,151 @@
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from src.models import db, Purchase, Invoice, Inventory, Provider, Product
+from src.stock import record_movement
+from src.sequences import allocate_numbers, COMPRA
+
+REQUIRED_FIELDS = ("orden_compra", "metodo", "provider_id", "product_id", "quantity", "total")
+# Líneas por recepción en POST /purchases/batch
+MAX_LINES = 1000
+DEFAULT_TAX = 0.19
+
+
+class PurchaseError(ValueError):
+    def __init__(self, errors):
+        super().__init__("; ".join(f"Línea {error['line']}: {error['error']}" for error in errors))
+        self.errors = errors
+
+
+def _parse(data, inventory_id):
+    if not isinstance(data, dict):
+        raise ValueError("La compra debe ser un objeto")
+    for field in REQUIRED_FIELDS:
+        if data.get(field) in (None, ""):
+            raise ValueError(f"{field} is required")
+    try:
+        provider_id = int(data["provider_id"])
+        product_id = int(data["product_id"])
+        quantity = int(data["quantity"])
+    except (TypeError, ValueError):
+        raise ValueError("provider_id, product_id y quantity deben ser enteros")
+    if quantity <= 0:
+        raise ValueError("quantity debe ser mayor que 0")
+    try:
+        total = float(data["total"])
+    except (TypeError, ValueError):
+        raise ValueError("total must be a valid number")
+    if data.get("inventory_id") not in (None, "") and str(data["inventory_id"]) != str(inventory_id):
+        raise ValueError("Inventario no encontrado")
+    return {
+        "orden_compra": str(data["orden_compra"]),
+        "metodo": data["metodo"],
+        "provider_id": provider_id,
+        "product_id": product_id,
+        "quantity": quantity,
+        "total": total,
+        "numero_comprobante": str(data["numero_comprobante"]) if data.get("numero_comprobante") else None,
+        "status": data.get("status") or "Pending",
+    }
+
+
+def register_purchases(lines, tenant):
+    """
+    Registra compras del inventario del tenant como una sola unidad: cada línea
+    crea la compra, su factura y el movimiento de stock. Si alguna línea es
+    inválida no se registra ninguna (PurchaseError con el detalle por línea).
+    Hace un solo flush y no hace commit; retorna las compras en el orden recibido.
+    """
+    errors = []
+    parsed = []
+    for line, data in enumerate(lines, start=1):
+        try:
+            parsed.append((line, _parse(data, tenant.inventory_id)))
+        except ValueError as e:
+            errors.append({"line": line, "error": str(e)})
+
+    # Proveedores, productos y duplicados en una consulta cada uno
+    provider_ids = {values["provider_id"] for _, values in parsed}
+    product_ids = {values["product_id"] for _, values in parsed}
+    ordenes = [values["orden_compra"] for _, values in parsed]
+    numeros = [values["numero_comprobante"] for _, values in parsed if values["numero_comprobante"]]
+    providers = {
+        provider.id: provider
+        for provider in Provider.query.filter(
+            Provider.id.in_(provider_ids), Provider.inventory_id == tenant.inventory_id
+        )
+    } if provider_ids else {}
+    products = {
+        product.id: product
+        for product in Product.query.options(joinedload(Product.ubicacion)).filter(
+            Product.id.in_(product_ids), Product.inventory_id == tenant.inventory_id
+        )
+    } if product_ids else {}
+    taken_ordenes = {orden for (orden,) in db.session.query(Purchase.orden_compra).filter(
+        Purchase.orden_compra.in_(ordenes)
+    )} if ordenes else set()
+    taken_numeros = {numero for (numero,) in db.session.query(Invoice.numero_comprobante).filter(
+        Invoice.numero_comprobante.in_(numeros)
+    )} if numeros else set()
+
+    seen_ordenes, seen_numeros = set(), set()
+    for line, values in parsed:
+        orden, numero = values["orden_compra"], values["numero_comprobante"]
+        if values["provider_id"] not in providers:
+            errors.append({"line": line, "error": "Proveedor no encontrado"})
+        elif values["product_id"] not in products:
+            errors.append({"line": line, "error": "Producto no encontrado"})
+        elif orden in taken_ordenes or orden in seen_ordenes:
+            errors.append({"line": line, "error": f"orden_compra {orden} ya existe"})
+        elif numero and (numero in taken_numeros or numero in seen_numeros):
+            errors.append({"line": line, "error": f"numero_comprobante {numero} ya existe"})
+        seen_ordenes.add(orden)
+        if numero:
+            seen_numeros.add(numero)
+    if errors:
+        raise PurchaseError(sorted(errors, key=lambda error: error["line"]))
+
+    # Folios faltantes antes de escribir (el contador usa su propia transacción).
+    # Secuencia propia de compras: no deja saltos en la numeración de ventas
+    without_numero = [values for _, values in parsed if not values["numero_comprobante"]]
+    for values, numero in zip(without_numero, allocate_numbers(tenant.user_id, COMPRA, len(without_numero))):
+        values["numero_comprobante"] = numero
+
+    inventory = db.session.get(Inventory, tenant.inventory_id)
+    tax = tenant.impuesto if tenant.impuesto is not None else DEFAULT_TAX
+    purchases = {}
+    # Orden fijo por producto al descontar stock (igual que el checkout de ventas).
+    # Sin autoflush: compras, facturas y movimientos se insertan juntos en un solo flush
+    with db.session.no_autoflush:
+        for line, values in sorted(parsed, key=lambda entry: (entry[1]["product_id"], entry[0])):
+            product = products[values["product_id"]]
+            purchase = Purchase(
+                orden_compra=values["orden_compra"],
+                metodo=values["metodo"],
+                provider=providers[values["provider_id"]],
+                products=product,
+                inventory=inventory,
+                quantity=values["quantity"],
+                total=values["total"]
+            )
+            movement = record_movement(
+                product.id, tenant.inventory_id, "compra", values["quantity"], registered_by=tenant.user_id
+            )
+            # Stock ya conocido por el UPDATE ... RETURNING; evita recargar el producto
+            set_committed_value(product, "stock", movement.balance)
+            purchase.movements.append(movement)
+
+            monto_base = values["total"]
+            impuesto_aplicado = monto_base * tax
+            purchase.invoice = Invoice(
+                user_id=tenant.user_id,
+                inventory_id=tenant.inventory_id,
+                numero_comprobante=values["numero_comprobante"],
+                monto_base=monto_base,
+                impuesto_aplicado=impuesto_aplicado,
+                total_final=monto_base - impuesto_aplicado,
+                status=values["status"]
+            )
+            db.session.add(purchase)
+            purchases[line] = purchase
+    db.session.flush()
+    return [purchases[line] for line, _ in parsed]
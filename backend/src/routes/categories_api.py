@@ -1,11 +1,13 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required
 from src.models import db, Category
+from src.etags import conditional_get, mark_changed, CATEGORIES, GLOBAL_SCOPE
 
 categories_api = Blueprint("categories_api", __name__)
 
 @categories_api.route('/categories', methods=['GET'])
 @jwt_required()
+@conditional_get(CATEGORIES, lambda tenant: GLOBAL_SCOPE)
 def get_categories():
     categories = Category.query.all()
     return jsonify([cat.serialize() for cat in categories]), 200
@@ -20,6 +22,7 @@ def create_category():
         return jsonify({"error": "La categoría ya existe"}), 409
     new_cat = Category(nombre=data.get("nombre"))
     try:
+        mark_changed(CATEGORIES, GLOBAL_SCOPE)
         new_cat.save()
     except Exception as e:
         return jsonify({"error": "Error al guardar categoría", "details": str(e)}), 500
@@ -1,40 +1,43 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models import db, Configuration, User
+from flask_jwt_extended import jwt_required
+from src.models import db, Configuration
+from src.tenant import get_current_tenant, invalidate_tenant
+from src.etags import conditional_get, mark_changed, CONFIGURACIONES
 
 configurations_api = Blueprint("configurations_api", __name__)
 
 # Endpoint para obtener la configuración del usuario autenticado.
 @configurations_api.route('/configuraciones', methods=['GET'])
 @jwt_required()
+@conditional_get(CONFIGURACIONES, lambda tenant: tenant.user_id)
 def get_configuration():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user:
+    tenant = get_current_tenant()
+    if not tenant:
         return jsonify({"error": "Usuario no encontrado"}), 404
-    configuration = Configuration.query.filter_by(user_id=user.id).first()
+    configuration = Configuration.query.get(tenant.configuration_id) if tenant.configuration_id else None
     if not configuration:
         # Si no existe, se crea una configuración por defecto con impuesto 0.19 y moneda CLP
         configuration = Configuration(
-            user_id=user.id,
+            user_id=tenant.user_id,
             impuesto=0.19,
             moneda="CLP",
             formato_facturacion="Factura Electrónica"
         )
         try:
+            mark_changed(CONFIGURACIONES, tenant.user_id)
             configuration.save()
         except Exception as e:
             db.session.rollback()
             return jsonify({"error": "Error al crear configuración", "details": str(e)}), 500
+        invalidate_tenant(tenant.user_id)
     return jsonify(configuration.serialize()), 200
 
 # Endpoint para crear la configuración (se fuerza siempre impuesto=0.19 y moneda="CLP")
 @configurations_api.route('/configuraciones', methods=['POST'])
 @jwt_required()
 def create_configuration():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user:
+    tenant = get_current_tenant()
+    if not tenant:
         return jsonify({"error": "Usuario no encontrado"}), 404
 
     data = request.get_json()
@@ -43,20 +46,22 @@ def create_configuration():
     moneda = "CLP"
     formato_facturacion = data.get("formato_facturacion", "Factura Electrónica")
 
-    if Configuration.query.filter_by(user_id=user.id).first():
+    if tenant.configuration_id or Configuration.query.filter_by(user_id=tenant.user_id).first():
         return jsonify({"error": "La configuración ya existe"}), 400
 
     configuration = Configuration(
-        user_id=user.id,
+        user_id=tenant.user_id,
         impuesto=impuesto,
         moneda=moneda,
         formato_facturacion=formato_facturacion
     )
     try:
+        mark_changed(CONFIGURACIONES, tenant.user_id)
         configuration.save()
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Error al crear configuración", "details": str(e)}), 500
+    invalidate_tenant(tenant.user_id)
 
     return jsonify(configuration.serialize()), 201
 
@@ -64,12 +69,11 @@ def create_configuration():
 @configurations_api.route('/configuraciones/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_configuration(id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user:
+    tenant = get_current_tenant()
+    if not tenant:
         return jsonify({"error": "Usuario no encontrado"}), 404
 
-    configuration = Configuration.query.filter_by(id=id, user_id=user.id).first()
+    configuration = Configuration.query.filter_by(id=id, user_id=tenant.user_id).first()
     if not configuration:
         return jsonify({"error": "Configuración no encontrada"}), 404
 
@@ -81,10 +85,12 @@ def update_configuration(id):
         configuration.formato_facturacion = data["formato_facturacion"]
 
     try:
+        mark_changed(CONFIGURACIONES, tenant.user_id)
         configuration.update()
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Error al actualizar la configuración", "details": str(e)}), 500
+    invalidate_tenant(tenant.user_id)
 
     return jsonify(configuration.serialize()), 200
 
@@ -92,19 +98,20 @@ def update_configuration(id):
 @configurations_api.route('/configuraciones/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_configuration(id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user:
+    tenant = get_current_tenant()
+    if not tenant:
         return jsonify({"error": "Usuario no encontrado"}), 404
 
-    configuration = Configuration.query.filter_by(id=id, user_id=user.id).first()
+    configuration = Configuration.query.filter_by(id=id, user_id=tenant.user_id).first()
     if not configuration:
         return jsonify({"error": "Configuración no encontrada"}), 404
 
     try:
+        mark_changed(CONFIGURACIONES, tenant.user_id)
         configuration.delete()
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Error al eliminar la configuración", "details": str(e)}), 500
+    invalidate_tenant(tenant.user_id)
 
     return jsonify({"message": "Configuración eliminada correctamente"}), 200
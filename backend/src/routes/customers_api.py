@@ -2,6 +2,7 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models import db, Customer
+from src.pagination import paginated_response
 
 customers_api = Blueprint("customers_api", __name__)
 
@@ -10,8 +11,12 @@ customers_api = Blueprint("customers_api", __name__)
 @jwt_required()
 def get_customers():
     user_id = get_jwt_identity()
-    customers = Customer.query.filter_by(user_id=user_id).all()
-    return jsonify([customer.serialize() for customer in customers]), 200
+    query = Customer.query.filter_by(user_id=user_id)
+    return paginated_response(
+        query, Customer,
+        sortable=("id", "name", "email"),
+        filterable=("email", "rut")
+    )
 
 # POST /api/customers
 @customers_api.route('/customers', methods=['POST'])
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import case, func, distinct
+from sqlalchemy.orm import joinedload
+from src.models import db, Invoice
+
+dashboard_api = Blueprint("dashboard_api", __name__)
+
+# Estados de factura que usa el frontend
+STATUS_PAID = "Pagada"
+STATUS_PENDING = "Pendiente"
+
+
+def _month_window(today):
+    start = datetime(today.year, today.month, 1)
+    end = datetime(start.year + 1, 1, 1) if start.month == 12 else datetime(start.year, start.month + 1, 1)
+    prev_start = datetime(start.year - 1, 12, 1) if start.month == 1 else datetime(start.year, start.month - 1, 1)
+    return start, end, prev_start, start
+
+
+def _parse_window(args):
+    """
+    Ventana actual y anterior. Por defecto mes actual vs mes anterior;
+    con ?from=YYYY-MM-DD&to=YYYY-MM-DD la ventana anterior tiene el mismo largo.
+    """
+    if "from" not in args and "to" not in args:
+        return _month_window(datetime.utcnow())
+    start = datetime.fromisoformat(args["from"]) if "from" in args else None
+    # "to" es inclusivo: se compara contra el inicio del día siguiente
+    end = datetime.fromisoformat(args["to"]) + timedelta(days=1) if "to" in args else datetime.utcnow()
+    if start is None:
+        start = end - timedelta(days=30)
+    if start >= end:
+        raise ValueError("'from' debe ser anterior a 'to'")
+    length = end - start
+    return start, end, start - length, start
+
+
+def _percentage(current, previous):
+    # Misma fórmula que usaba el Dashboard en el navegador
+    if previous > 0:
+        return round(((current - previous) / previous) * 100)
+    return 100 if current > 0 else 0
+
+
+@dashboard_api.route('/dashboard/kpis', methods=['GET'])
+@jwt_required()
+def get_kpis():
+    user_id = get_jwt_identity()
+    try:
+        start, end, prev_start, prev_end = _parse_window(request.args)
+    except ValueError as e:
+        return jsonify({"error": "Fecha inválida", "details": str(e)}), 400
+
+    # Solo facturas de venta: las de compra (purchase_id) no son ingresos
+    sales_invoices = (Invoice.user_id == user_id, Invoice.purchase_id.is_(None))
+    in_current = (Invoice.invoice_date >= start) & (Invoice.invoice_date < end)
+    in_previous = (Invoice.invoice_date >= prev_start) & (Invoice.invoice_date < prev_end)
+    paid = Invoice.status == STATUS_PAID
+    pending = Invoice.status == STATUS_PENDING
+
+    def money(*conditions):
+        cond = conditions[0]
+        for extra in conditions[1:]:
+            cond = cond & extra
+        return func.coalesce(func.sum(case((cond, Invoice.total_final), else_=0)), 0)
+
+    def count_in(window):
+        return func.count(case((window, Invoice.id)))
+
+    def customers_in(window):
+        return func.count(distinct(case((window, Invoice.customer_id))))
+
+    # Todos los KPIs en una sola consulta con agregación condicional
+    row = db.session.query(
+        money(paid),
+        money(pending),
+        func.count(Invoice.id),
+        func.count(distinct(Invoice.customer_id)),
+        money(paid, in_current),
+        money(paid, in_previous),
+        money(pending, in_current),
+        money(pending, in_previous),
+        count_in(in_current),
+        count_in(in_previous),
+        customers_in(in_current),
+        customers_in(in_previous),
+    ).filter(*sales_invoices).one()
+
+    (collected, pending_total, total_invoices, total_customers,
+     cur_collected, prev_collected, cur_pending, prev_pending,
+     cur_invoices, prev_invoices, cur_customers, prev_customers) = row
+
+    def comparative(current, previous):
+        return {"current": current, "previous": previous, "percentage": _percentage(current, previous)}
+
+    result = {
+        "kpis": {
+            "moneyCollected": collected,
+            "moneyPending": pending_total,
+            "totalInvoices": total_invoices,
+            "totalCustomers": total_customers,
+        },
+        "comparative": {
+            "collected": comparative(cur_collected, prev_collected),
+            "pending": comparative(cur_pending, prev_pending),
+            "totalInvoices": comparative(cur_invoices, prev_invoices),
+            "totalCustomers": comparative(cur_customers, prev_customers),
+        },
+        "window": {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "previous_from": prev_start.isoformat(),
+            "previous_to": prev_end.isoformat(),
+        },
+    }
+
+    if request.args.get("monthly", "true").lower() != "false":
+        year = func.extract("year", Invoice.invoice_date)
+        month = func.extract("month", Invoice.invoice_date)
+        rows = db.session.query(
+            year, month, money(paid), money(pending)
+        ).filter(*sales_invoices).group_by(year, month).order_by(year, month).all()
+        result["monthly"] = [
+            {"year": int(y), "month": int(m), "collected": c, "pending": p}
+            for y, m, c, p in rows if y is not None
+        ]
+
+    if request.args.get("latest", "true").lower() != "false":
+        latest = (
+            Invoice.query.options(joinedload(Invoice.customer))
+            .filter(*sales_invoices)
+            .order_by(Invoice.id.desc())
+            .limit(3)
+            .all()
+        )
+        result["latest_invoices"] = [invoice.serialize() for invoice in reversed(latest)]
+
+    return jsonify(result), 200
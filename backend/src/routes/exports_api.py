@@ -0,0 +1,178 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from flask_jwt_extended import jwt_required
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+from src.models import db, Invoice, Sale, Movement, Product
+from src.tenant import get_current_tenant
+
+exports_api = Blueprint("exports_api", __name__)
+
+# Filas que se leen desde la base de datos por cada viaje del cursor
+YIELD_PER = 1000
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _invoice_row(invoice):
+    return {
+        "id": invoice.id,
+        "numero_comprobante": invoice.numero_comprobante,
+        "numero_nota": invoice.numero_nota,
+        "tipo": invoice.tipo,
+        "status": invoice.status,
+        "customer_id": invoice.customer_id,
+        "customer_name": invoice.customer.name if invoice.customer else None,
+        "customer_email": invoice.customer.email if invoice.customer else None,
+        "monto_base": invoice.monto_base,
+        "impuesto_aplicado": invoice.impuesto_aplicado,
+        "total_final": invoice.total_final,
+        "invoice_date": _iso(invoice.invoice_date),
+        "hidden": invoice.hidden,
+    }
+
+
+def _sale_row(sale):
+    return {
+        "id": sale.id,
+        "product_id": sale.product_id,
+        "product_codigo": sale.product.codigo if sale.product else None,
+        "product_nombre": sale.product.nombre if sale.product else None,
+        "customer_id": sale.customer_id,
+        "customer_name": sale.customer.name if sale.customer else None,
+        "quantity": sale.quantity,
+        "total": sale.total,
+        "sale_date": _iso(sale.sale_date),
+    }
+
+
+def _movement_row(movement):
+    user = movement.registered_by_user
+    return {
+        "id": movement.id,
+        "product_id": movement.product_id,
+        "type": movement.type,
+        "quantity": movement.quantity,
+        "balance": movement.balance,
+        "purchase_id": movement.purchase_id,
+        "date": _iso(movement.date),
+        "registered_by": f"{user.first_name} {user.last_name}" if user else None,
+    }
+
+
+def _product_row(product):
+    return {
+        "id": product.id,
+        "codigo": product.codigo,
+        "nombre": product.nombre,
+        "categoria": product.categoria,
+        "precio": product.precio,
+        "stock": product.stock,
+        "ubicacion": product.ubicacion.nombre if product.ubicacion else None,
+    }
+
+
+def _invoices_query(tenant):
+    return (select(Invoice).options(joinedload(Invoice.customer))
+            .where(Invoice.user_id == tenant.user_id, Invoice.purchase_id.is_(None))
+            .order_by(Invoice.id)), Invoice.invoice_date
+
+
+def _sales_query(tenant):
+    return (select(Sale).options(joinedload(Sale.product), joinedload(Sale.customer))
+            .where(Sale.user_id == tenant.user_id).order_by(Sale.id)), Sale.sale_date
+
+
+def _movements_query(tenant):
+    return (select(Movement).options(joinedload(Movement.registered_by_user))
+            .where(Movement.inventory_id == tenant.inventory_id).order_by(Movement.id)), Movement.date
+
+
+def _products_query(tenant):
+    return (select(Product).options(joinedload(Product.ubicacion))
+            .where(Product.user_id == tenant.user_id).order_by(Product.id)), None
+
+
+# recurso -> (consulta y columna de fecha, fila plana)
+EXPORTS = {
+    "invoices": (_invoices_query, _invoice_row),
+    "sales": (_sales_query, _sale_row),
+    "movements": (_movements_query, _movement_row),
+    "products": (_products_query, _product_row),
+}
+
+
+def _rows(engine, query, to_row):
+    """
+    Lee la consulta con un cursor del lado del servidor en una sesión propia:
+    la respuesta se sigue enviando después de que Flask cierra la sesión del request.
+    """
+    session = Session(engine)
+    try:
+        result = session.execute(query.execution_options(yield_per=YIELD_PER)).scalars()
+        for item in result:
+            yield to_row(item)
+    finally:
+        session.close()
+
+
+def _ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def _csv(rows):
+    buffer = io.StringIO()
+    writer = None
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row))
+            writer.writeheader()
+        writer.writerow(row)
+        # Se envía cada fila apenas se escribe, sin acumular el archivo completo
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+
+# GET /api/exports/<recurso>.<ndjson|csv>?from=YYYY-MM-DD&to=YYYY-MM-DD
+@exports_api.route('/exports/<resource>.<fmt>', methods=['GET'])
+@jwt_required()
+def export_resource(resource, fmt):
+    if resource not in EXPORTS:
+        return jsonify({"error": f"Recurso no exportable: {resource}"}), 404
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "Formato no soportado, use ndjson o csv"}), 400
+
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
+        return jsonify({"error": "User or inventory not found"}), 404
+
+    build_query, to_row = EXPORTS[resource]
+    query, date_column = build_query(tenant)
+    try:
+        if date_column is not None and request.args.get("from"):
+            query = query.where(date_column >= datetime.fromisoformat(request.args["from"]))
+        if date_column is not None and request.args.get("to"):
+            # "to" es inclusivo: hasta el inicio del día siguiente
+            query = query.where(date_column < datetime.fromisoformat(request.args["to"]) + timedelta(days=1))
+    except ValueError:
+        return jsonify({"error": "Fecha inválida, use YYYY-MM-DD"}), 400
+
+    # Las filas se leen y envían por bloques
+    rows = _rows(db.engine, query, to_row)
+
+    if fmt == "csv":
+        body, mimetype = _csv(rows), "text/csv"
+    else:
+        body, mimetype = _ndjson(rows), "application/x-ndjson"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={resource}.{fmt}"}
+    )
@@ -1,7 +1,13 @@
 # src/api/invoices_api.py
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models import db, Invoice, Configuration, User, Customer
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from src.models import db, Invoice, Customer
+from src.tenant import get_current_tenant
+from src.pagination import paginated_response
+from src.invoice_import import create_invoices
+from src.sequences import next_number, COMPROBANTE, NOTA
 
 invoices_api = Blueprint("invoices_api", __name__)
 
@@ -10,8 +16,16 @@ invoices_api = Blueprint("invoices_api", __name__)
 @jwt_required()
 def get_invoices():
     user_id = get_jwt_identity()
-    invoices = Invoice.query.filter_by(user_id=user_id).all()
-    return jsonify([invoice.serialize() for invoice in invoices]), 200
+    # Solo facturas de venta: las de compra (purchase_id) se ven en /api/purchases
+    query = (
+        Invoice.query.options(joinedload(Invoice.customer))
+        .filter(Invoice.user_id == user_id, Invoice.purchase_id.is_(None))
+    )
+    return paginated_response(
+        query, Invoice,
+        sortable=("id", "invoice_date", "total_final"),
+        filterable=("status", "tipo", "customer_id", "hidden")
+    )
 
 # Endpoint para crear una factura
 @invoices_api.route('/invoices', methods=['POST'])
@@ -21,30 +35,33 @@ def create_invoice():
     
     if "monto_base" not in data:
         return jsonify({"error": "monto_base is required"}), 400
-    if "numero_comprobante" not in data:
-        return jsonify({"error": "numero_comprobante is required"}), 400
     
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user:
+    tenant = get_current_tenant()
+    if not tenant:
         return jsonify({"error": "User not found"}), 404
-    if not user.inventory:
+    if not tenant.inventory_id:
         return jsonify({"error": "No inventory found for the user"}), 400
 
+    numero_comprobante = data.get("numero_comprobante")
+    if numero_comprobante and Invoice.query.filter_by(numero_comprobante=numero_comprobante).first():
+        return jsonify({"error": "numero_comprobante ya existe"}), 409
+
     # Manejo de datos del cliente
     if "customer_id" in data:
         customer_id = data["customer_id"]
+        if not Customer.query.filter_by(id=customer_id, user_id=tenant.user_id).first():
+            return jsonify({"error": "Customer not found"}), 404
     else:
         for field in ["customer_name", "customer_email"]:
             if field not in data:
                 return jsonify({"error": f"{field} is required"}), 400
-        customer = Customer.query.filter_by(email=data["customer_email"], user_id=user.id).first()
+        customer = Customer.query.filter_by(email=data["customer_email"], user_id=tenant.user_id).first()
         if not customer:
             customer = Customer(
                 name=data["customer_name"],
                 email=data["customer_email"],
                 phone=data.get("phone", ""),
-                user_id=user.id
+                user_id=tenant.user_id
             )
             try:
                 customer.save()
@@ -58,43 +75,75 @@ def create_invoice():
     except ValueError:
         return jsonify({"error": "monto_base must be a valid number"}), 400
 
-    config_obj = Configuration.query.filter_by(user_id=user.id).first()
-    tax = config_obj.impuesto if config_obj else 0.19
+    tax = tenant.impuesto if tenant.impuesto is not None else 0.19
 
     impuesto_aplicado = monto_base * tax
     total_final = monto_base + impuesto_aplicado
 
+    # Sin folio, el servidor asigna el siguiente del usuario (recién validada la factura,
+    # para no dejar saltos en la numeración por solicitudes inválidas)
+    if not numero_comprobante:
+        numero_comprobante = next_number(tenant.user_id, COMPROBANTE)
+
     invoice = Invoice(
-        user_id=user.id,
-        inventory_id=user.inventory.id,
+        user_id=tenant.user_id,
+        inventory_id=tenant.inventory_id,
         customer_id=customer_id,
         monto_base=monto_base,
         impuesto_aplicado=impuesto_aplicado,
         total_final=total_final,
         status=data.get("status", "Pending"),
-        numero_comprobante=data["numero_comprobante"],
+        numero_comprobante=numero_comprobante,
         tipo=data.get("tipo", "Factura"),
         hidden=data.get("hidden", False)  # Por defecto la factura se crea sin ocultar
     )
 
     try:
         invoice.save()
+    except IntegrityError:
+        # Folio tomado por otra solicitud entre la verificación y el guardado
+        db.session.rollback()
+        return jsonify({"error": "numero_comprobante ya existe"}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Error saving invoice", "details": str(e)}), 500
 
     return jsonify(invoice.serialize()), 200
 
+# Endpoint para crear facturas en lote (facturación de fin de mes)
+# Body: arreglo de facturas con el mismo formato que POST /invoices (folio opcional)
+@invoices_api.route('/invoices/bulk', methods=['POST'])
+@jwt_required()
+def create_invoices_bulk():
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        return jsonify({"error": "Se espera un arreglo de facturas"}), 400
+
+    tenant = get_current_tenant()
+    if not tenant:
+        return jsonify({"error": "User not found"}), 404
+    if not tenant.inventory_id:
+        return jsonify({"error": "No inventory found for the user"}), 400
+
+    try:
+        report = create_invoices(items, tenant)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error en la creación masiva de facturas: {e}")
+        return jsonify({"error": "Error al crear las facturas", "details": str(e)}), 500
+
+    status = 200 if report["created"] or not report["failed"] else 400
+    return jsonify(report), status
+
 # Endpoint para actualizar una factura (incluye ocultación)
 @invoices_api.route('/invoices/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_invoice(id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user:
+    tenant = get_current_tenant()
+    if not tenant:
         return jsonify({"error": "User not found"}), 404
 
-    invoice = Invoice.query.filter_by(id=id, user_id=user.id).first()
+    invoice = Invoice.query.filter_by(id=id, user_id=tenant.user_id).first()
     if not invoice:
         return jsonify({"error": "Invoice not found"}), 404
 
@@ -116,15 +165,20 @@ def update_invoice(id):
         invoice.hidden = data["hidden"]
 
     if "numero_nota" in data:
-        invoice.numero_nota = data["numero_nota"]
+        if data["numero_nota"]:
+            invoice.numero_nota = data["numero_nota"]
+        elif not invoice.numero_nota:
+            invoice.numero_nota = next_number(tenant.user_id, NOTA)
 
-    config_obj = Configuration.query.filter_by(user_id=user.id).first()
-    tax = config_obj.impuesto if config_obj else 0.19
+    tax = tenant.impuesto if tenant.impuesto is not None else 0.19
     invoice.impuesto_aplicado = invoice.monto_base * tax
     invoice.total_final = invoice.monto_base + invoice.impuesto_aplicado
 
     try:
         invoice.update()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "numero_nota ya existe"}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Error updating invoice", "details": str(e)}), 500
@@ -1,6 +1,9 @@
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from flask import Blueprint, request, jsonify
-from src.models import db, Movement, User
+from src.models import db, Movement, Product
+from src.tenant import get_current_tenant
+from src.pagination import paginated_response
+from src.stock import record_movement, compensate_movements, is_reverted, signed_quantity, StockError, InsufficientStock
 
 # Blueprint para Movimientos
 movements_api = Blueprint("movements_api", __name__)
@@ -9,29 +12,27 @@ movements_api = Blueprint("movements_api", __name__)
 @movements_api.route('/movements', methods=['GET'])
 @jwt_required()
 def get_movements():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not user.inventory:
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
         return jsonify({"error": "User or inventory not found"}), 404
 
-    product_id = request.args.get('product_id')
-    if product_id:
-        movements = Movement.query.filter_by(inventory_id=user.inventory.id, product_id=product_id).all()
-    else:
-        movements = Movement.query.filter_by(inventory_id=user.inventory.id).all()
-    return jsonify([movement.serialize() for movement in movements]), 200
+    query = Movement.query.filter_by(inventory_id=tenant.inventory_id)
+    return paginated_response(
+        query, Movement,
+        sortable=("id", "date"),
+        filterable=("product_id", "type")
+    )
 
 
 # Obtener un movimiento específico (solo si pertenece al inventario del usuario)
 @movements_api.route('/movements/<int:id>', methods=['GET'])
 @jwt_required()
 def get_movement(id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not user.inventory:
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
         return jsonify({"error": "User or inventory not found"}), 404
 
-    movement = Movement.query.filter_by(id=id, inventory_id=user.inventory.id).first()
+    movement = Movement.query.filter_by(id=id, inventory_id=tenant.inventory_id).first()
     if not movement:
         return jsonify({"error": "Movement not found"}), 404
     return jsonify(movement.serialize()), 200
@@ -46,52 +47,113 @@ def create_movement():
         if field not in data:
             return jsonify({"error": f"{field} is required"}), 400
 
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not user.inventory:
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
         return jsonify({"error": "User or inventory not found"}), 404
 
-    movement = Movement(
-        product_id=data['product_id'],
-        type=data['type'],
-        quantity=data['quantity'],
-        inventory_id=user.inventory.id
-    )
-    movement.save()
+    try:
+        movement = record_movement(
+            data['product_id'],
+            tenant.inventory_id,
+            data['type'],
+            data['quantity'],
+            registered_by=tenant.user_id
+        )
+        db.session.commit()
+    except StockError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 409 if isinstance(e, InsufficientStock) else 400
     return jsonify(movement.serialize()), 201
 
 # Actualizar un movimiento (solo si pertenece al inventario del usuario)
+# Los movimientos del libro de stock (con balance) no se editan: se anulan con un
+# ajuste inverso y se registra el movimiento corregido, que es el que se retorna
 @movements_api.route('/movements/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_movement(id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not user.inventory:
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
         return jsonify({"error": "User or inventory not found"}), 404
 
-    movement = Movement.query.filter_by(id=id, inventory_id=user.inventory.id).first()
+    movement = Movement.query.filter_by(id=id, inventory_id=tenant.inventory_id).first()
     if not movement:
         return jsonify({"error": "Movement not found"}), 404
 
     data = request.get_json()
-    movement.product_id = data.get('product_id', movement.product_id)
-    movement.type = data.get('type', movement.type)
-    movement.quantity = data.get('quantity', movement.quantity)
-    movement.update()
-    return jsonify(movement.serialize()), 200
+    product_id = data.get('product_id', movement.product_id)
+    movement_type = data.get('type', movement.type)
+    quantity = data.get('quantity', movement.quantity)
+    try:
+        new_delta = signed_quantity(movement_type, quantity)
+    except StockError as e:
+        return jsonify({"error": str(e)}), 400
+    if str(product_id) != str(movement.product_id) and not Product.query.filter_by(
+        id=product_id, inventory_id=tenant.inventory_id
+    ).first():
+        return jsonify({"error": "Producto no encontrado"}), 404
+
+    if movement.balance is None:
+        # Anterior al libro: nunca modificó el stock, se corrige el registro sin tocarlo
+        movement.product_id = product_id
+        movement.type = movement_type
+        movement.quantity = int(quantity)
+        movement.update()
+        return jsonify(movement.serialize()), 200
+
+    if movement.reverses_id is not None or is_reverted(movement):
+        return jsonify({"error": "El movimiento está anulado"}), 409
+    unchanged = (str(product_id), movement_type, int(quantity)) == (
+        str(movement.product_id), movement.type, movement.quantity
+    )
+    if unchanged:
+        return jsonify(movement.serialize()), 200
+
+    def record_corrected():
+        return record_movement(product_id, tenant.inventory_id, movement_type, quantity,
+                               registered_by=tenant.user_id, purchase_id=movement.purchase_id,
+                               sale_id=movement.sale_id)
+
+    try:
+        # Primero el cambio que suma stock, para no fallar por stock insuficiente de paso
+        if new_delta >= -signed_quantity(movement.type, movement.quantity):
+            corrected = record_corrected()
+            compensate_movements([movement], tenant.inventory_id, registered_by=tenant.user_id)
+        else:
+            compensate_movements([movement], tenant.inventory_id, registered_by=tenant.user_id)
+            corrected = record_corrected()
+        db.session.commit()
+    except StockError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 409 if isinstance(e, InsufficientStock) else 400
+    return jsonify(corrected.serialize()), 200
 
 # Eliminar un movimiento (solo si pertenece al inventario del usuario)
+# Los movimientos del libro de stock se anulan con un ajuste inverso en vez de borrarse
 @movements_api.route('/movements/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_movement(id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not user.inventory:
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
         return jsonify({"error": "User or inventory not found"}), 404
 
-    movement = Movement.query.filter_by(id=id, inventory_id=user.inventory.id).first()
+    movement = Movement.query.filter_by(id=id, inventory_id=tenant.inventory_id).first()
     if not movement:
         return jsonify({"error": "Movement not found"}), 404
 
-    movement.delete()
-    return jsonify({"message": "Movement deleted"}), 200
+    if movement.balance is None:
+        # Anterior al libro: no modificó el stock, se puede borrar sin compensar
+        movement.delete()
+        return jsonify({"message": "Movement deleted"}), 200
+
+    if movement.reverses_id is not None or is_reverted(movement):
+        return jsonify({"error": "El movimiento ya está anulado"}), 409
+    try:
+        adjustments = compensate_movements([movement], tenant.inventory_id, registered_by=tenant.user_id)
+        db.session.commit()
+    except StockError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 409 if isinstance(e, InsufficientStock) else 400
+    return jsonify({
+        "message": "Movimiento anulado con un ajuste",
+        "adjustments": [adjustment.serialize() for adjustment in adjustments]
+    }), 200
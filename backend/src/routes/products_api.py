@@ -1,22 +1,70 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models import db, Product, Movement, Sale, Purchase, User
+from sqlalchemy.orm import joinedload
+from src.models import db, Product, Movement, Sale, Purchase
+from src.tenant import get_current_tenant
+from src.pagination import paginated_response
+from src.product_import import import_products, iter_upload
+from src.stock import record_movement, StockError
+from src.etags import conditional_get, mark_changed, PRODUCTS, PRODUCT_SEARCH
+from src.search import search_products, DEFAULT_LIMIT
+from src.product_cache import get_product_by_code, mark_product_changed
 
 products_api = Blueprint("products_api", __name__)
 
 # GET: Lista de productos para el usuario autenticado
 @products_api.route('/products', methods=['GET'])
 @jwt_required()
+@conditional_get(PRODUCTS, lambda tenant: tenant.user_id)
 def get_products():
     user_id = get_jwt_identity()
-    products = Product.query.filter_by(user_id=user_id).all()
-    return jsonify([product.serialize() for product in products]), 200
+    query = Product.query.options(joinedload(Product.ubicacion)).filter_by(user_id=user_id)
+    return paginated_response(
+        query, Product,
+        sortable=("id", "codigo", "nombre", "precio", "stock"),
+        filterable=("codigo", "categoria", "ubicacion_id")
+    )
+
+# GET: Búsqueda para typeahead y lectores de código de barras
+# /api/products/search?q=<texto>&categoria=<opcional>&limit=<opcional>
+@products_api.route('/products/search', methods=['GET'])
+@jwt_required()
+def search_products_route():
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"error": "q is required"}), 400
+    try:
+        limit = int(request.args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    tenant = get_current_tenant()
+    if not tenant:
+        return jsonify({"error": "User not found"}), 404
+
+    items, total, facets = search_products(tenant.user_id, q, request.args.get("categoria"), limit)
+    return jsonify({
+        "results": [product.serialize() for product in items],
+        "total": total,
+        "facets": {
+            "categoria": [{"value": value, "count": count} for value, count in facets.most_common()]
+        }
+    }), 200
+
+# GET: Producto por código (punto de venta / lector de código de barras)
+@products_api.route('/products/by-code/<codigo>', methods=['GET'])
+@jwt_required()
+def get_product_by_codigo(codigo):
+    product = get_product_by_code(get_jwt_identity(), codigo)
+    if not product:
+        return jsonify({"error": "Product not found"}), 404
+    return jsonify(product), 200
 
 # GET: Producto por ID
 @products_api.route('/products/<int:id>', methods=['GET'])
 @jwt_required()
 def get_product(id):
-    product = Product.query.get(id)
+    product = Product.query.filter_by(id=id, user_id=get_jwt_identity()).first()
     if not product:
         return jsonify({"error": "Product not found"}), 404
     return jsonify(product.serialize()), 200
@@ -29,33 +77,83 @@ def create_product():
     if not data.get("nombre"):
         return jsonify({"error": "Name is required"}), 400
 
-    user_id = get_jwt_identity()  # Usuario autenticado
-    user = User.query.get(user_id)
-    if not user or not user.inventory:
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
         return jsonify({"error": "User or inventory not found"}), 404
 
+    try:
+        initial_stock = int(data.get("stock") or 0)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Stock must be an integer"}), 400
+
+    # El stock inicial se registra como movimiento de ingreso
     product = Product(
         nombre=data.get("nombre"),
         precio=data.get("precio"),
         codigo=data.get("codigo"),
-        stock=data.get("stock"),
+        stock=0,
         categoria=data.get("categoria"),
-        inventory_id=user.inventory.id,
+        inventory_id=tenant.inventory_id,
         ubicacion_id=data.get("ubicacion_id"),  # opcional
-        user_id=user_id
+        user_id=tenant.user_id
     )
     try:
-        product.save()
+        db.session.add(product)
+        db.session.flush()
+        mark_changed(PRODUCTS, tenant.user_id)
+        mark_changed(PRODUCT_SEARCH, tenant.user_id)
+        if initial_stock:
+            record_movement(product.id, tenant.inventory_id, "ingreso", initial_stock, registered_by=tenant.user_id)
+        db.session.commit()
+    except StockError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
+        db.session.rollback()
         print(f"Error al guardar el producto: {e}")
         return jsonify({"error": "Error al guardar el producto", "detalles": str(e)}), 500
     return jsonify(product.serialize()), 201
 
+# POST: Importación masiva de productos (JSON o archivo CSV/XLSX)
+@products_api.route('/products/bulk', methods=['POST'])
+@jwt_required()
+def bulk_import_products():
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
+        return jsonify({"error": "User or inventory not found"}), 404
+
+    if "file" in request.files:
+        try:
+            rows = iter_upload(request.files["file"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    else:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            return jsonify({"error": "Se espera un arreglo de productos o un archivo"}), 400
+
+    try:
+        mark_changed(PRODUCTS, tenant.user_id)
+        mark_changed(PRODUCT_SEARCH, tenant.user_id)
+        mark_product_changed(tenant.user_id)
+        report = import_products(rows, tenant.user_id, tenant.inventory_id)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error en la importación de productos: {e}")
+        return jsonify({"error": "Error al importar productos", "details": str(e)}), 500
+
+    status = 200 if report["created"] or report["updated"] or not report["failed"] else 400
+    return jsonify(report), status
+
 # PUT: Actualizar un producto existente
 @products_api.route('/products/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_product(id):
-    product = Product.query.get(id)
+    # Solo productos del usuario: el cambio de stock se registra en su inventario
+    product = Product.query.filter_by(id=id, user_id=get_jwt_identity()).first()
     if not product:
         return jsonify({"error": "Product not found"}), 404
     data = request.get_json()
@@ -65,13 +163,29 @@ def update_product(id):
         product.descripcion = data["descripcion"]
     if data.get("precio"):
         product.precio = data["precio"]
-    if data.get("stock"):
-        product.stock = data["stock"]
+    if "stock" in data and data["stock"] not in (None, ""):
+        # Los cambios de stock quedan en el historial como ajuste
+        try:
+            stock = int(data["stock"])
+        except (TypeError, ValueError):
+            db.session.rollback()
+            return jsonify({"error": "Stock must be an integer"}), 400
+        try:
+            delta = stock - product.stock
+            if delta:
+                record_movement(product.id, product.inventory_id, "ajuste", delta, registered_by=get_jwt_identity())
+        except StockError as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), 400
     if data.get("categoria"):
         product.categoria = data["categoria"]
     if data.get("ubicacion_id"):
         product.ubicacion_id = data["ubicacion_id"]
     try:
+        mark_changed(PRODUCTS, product.user_id)
+        if data.get("nombre") or data.get("categoria"):
+            mark_changed(PRODUCT_SEARCH, product.user_id)
+        mark_product_changed(product.user_id, product.codigo)
         product.update()
     except Exception as e:
         return jsonify({"error": "Error updating product", "details": str(e)}), 500
@@ -81,7 +195,8 @@ def update_product(id):
 @products_api.route('/products/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_product(id):
-    product = Product.query.get(id)
+    # Solo productos del usuario: las cachés que se invalidan son las de su dueño
+    product = Product.query.filter_by(id=id, user_id=get_jwt_identity()).first()
     if not product:
         return jsonify({"error": "Product not found"}), 404
 
@@ -94,6 +209,9 @@ def delete_product(id):
         return jsonify({"error": "El producto tiene historial y no se puede eliminar"}), 409
 
     try:
+        mark_changed(PRODUCTS, product.user_id)
+        mark_changed(PRODUCT_SEARCH, product.user_id)
+        mark_product_changed(product.user_id, product.codigo)
         product.delete()
     except Exception as e:
         print(f"Error al eliminar el producto ID {id}: {e}")
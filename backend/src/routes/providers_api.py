@@ -1,18 +1,42 @@
 # src/routes/providers_api.py
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models import db, Provider, User
+from flask_jwt_extended import jwt_required
+from sqlalchemy import func, or_
+from src.models import db, Provider
+from src.tenant import get_current_tenant
+from src.pagination import paginated_response
 
 providers_api = Blueprint("providers_api", __name__)
 
+# Proveedores del inventario del usuario autenticado
+# ?q=<texto> busca por prefijo de nombre o RUT (sin distinguir mayúsculas)
 @providers_api.route('/providers', methods=['GET'])
+@jwt_required()
 def get_providers():
-    providers = Provider.get_all()
-    return jsonify([provider.serialize() for provider in providers]), 200
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
+        return jsonify({"error": "User or inventory not found"}), 404
+
+    query = Provider.query.filter(Provider.inventory_id == tenant.inventory_id)
+    q = (request.args.get("q") or "").strip()
+    if q:
+        pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        # Mismas expresiones que los índices ix_providers_inventory_id_lower_name / _lower_rut;
+        # el patrón se pasa a minúsculas aquí para que sea un literal y el índice aplique
+        query = query.filter(or_(
+            func.lower(Provider.name).like(pattern.lower(), escape="\\"),
+            func.lower(Provider.rut).like(pattern.lower(), escape="\\")
+        ))
+    return paginated_response(query, Provider, sortable=("id", "name"), filterable=("rut",))
 
 @providers_api.route('/providers/<int:id>', methods=['GET'])
+@jwt_required()
 def get_provider(id):
-    provider = Provider.find_by_id(id)
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
+        return jsonify({"error": "User or inventory not found"}), 404
+
+    provider = Provider.query.filter_by(id=id, inventory_id=tenant.inventory_id).first()
     if not provider:
         return jsonify({"error": "Provider not found"}), 404
     return jsonify(provider.serialize()), 200
@@ -26,9 +50,8 @@ def create_provider():
         return jsonify({"error": "Name is required"}), 400
 
     # Obtener el usuario autenticado y su inventario
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not user.inventory:
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
         return jsonify({"error": "User or inventory not found"}), 404
 
     provider = Provider(
@@ -37,7 +60,7 @@ def create_provider():
         phone=data.get('phone', ''),
         email=data.get('email', ''),
         rut=data.get('rut', ''),  # NUEVO CAMPO
-        inventory_id=user.inventory.id  # Asigna el inventory_id del usuario
+        inventory_id=tenant.inventory_id  # Asigna el inventory_id del usuario
     )
     try:
         provider.save()
@@ -46,8 +69,13 @@ def create_provider():
     return jsonify(provider.serialize()), 200
 
 @providers_api.route('/providers/<int:id>', methods=['PUT'])
+@jwt_required()
 def update_provider(id):
-    provider = Provider.find_by_id(id)
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
+        return jsonify({"error": "User or inventory not found"}), 404
+
+    provider = Provider.query.filter_by(id=id, inventory_id=tenant.inventory_id).first()
     if not provider:
         return jsonify({"error": "Provider not found"}), 404
     data = request.get_json()
@@ -60,8 +88,13 @@ def update_provider(id):
     return jsonify(provider.serialize()), 200
 
 @providers_api.route('/providers/<int:id>', methods=['DELETE'])
+@jwt_required()
 def delete_provider(id):
-    provider = Provider.find_by_id(id)
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
+        return jsonify({"error": "User or inventory not found"}), 404
+
+    provider = Provider.query.filter_by(id=id, inventory_id=tenant.inventory_id).first()
     if not provider:
         return jsonify({"error": "Provider not found"}), 404
     provider.delete()
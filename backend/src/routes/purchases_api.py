@@ -1,98 +1,194 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity
-from src.functions import verify_google_token, verify_google_access_token
-from datetime import timedelta
-from src.models import (db, Invoice, Purchase,Movement)
+from flask_jwt_extended import jwt_required
+from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload, selectinload
+from src.models import db, Purchase, Movement, Product
+from src.tenant import get_current_tenant
+from src.pagination import paginated_response
+from src.stock import record_movement, compensate_movements, StockError, InsufficientStock
+from src.purchases import register_purchases, PurchaseError, MAX_LINES
 
 
 
 # Compras
 purchases_api = Blueprint("purchases_api", __name__)
 
+# Compras del inventario del usuario autenticado
+# Filtros opcionales: from/to (YYYY-MM-DD, inclusivos) sobre purchase_date, provider_id, product_id, metodo
 @purchases_api.route('/purchases', methods=['GET'])
+@jwt_required()
 def get_purchases():
-    purchases = Purchase.get_all()
-    return jsonify([purchase.serialize() for purchase in purchases]), 200
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
+        return jsonify({"error": "User or inventory not found"}), 404
+
+    # Relaciones de serialize() cargadas junto a la página (cantidad de consultas constante)
+    query = (
+        Purchase.query
+        .options(
+            joinedload(Purchase.provider),
+            joinedload(Purchase.products).joinedload(Product.ubicacion),
+            joinedload(Purchase.inventory),
+            joinedload(Purchase.invoice),
+            selectinload(Purchase.movements).joinedload(Movement.registered_by_user)
+        )
+        .filter(Purchase.inventory_id == tenant.inventory_id)
+    )
+    try:
+        if request.args.get("from"):
+            query = query.filter(Purchase.purchase_date >= datetime.fromisoformat(request.args["from"]))
+        if request.args.get("to"):
+            # "to" es inclusivo: hasta el inicio del día siguiente
+            query = query.filter(Purchase.purchase_date < datetime.fromisoformat(request.args["to"]) + timedelta(days=1))
+    except ValueError:
+        return jsonify({"error": "Fecha inválida, use YYYY-MM-DD"}), 400
+
+    return paginated_response(
+        query, Purchase,
+        sortable=("id", "purchase_date", "total"),
+        filterable=("provider_id", "product_id", "metodo")
+    )
 
 @purchases_api.route('/purchases/<int:id>', methods=['GET'])
+@jwt_required()
 def get_purchase(id):
-    purchase = Purchase.find_by_id(id)
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
+        return jsonify({"error": "User or inventory not found"}), 404
+
+    purchase = Purchase.query.filter_by(id=id, inventory_id=tenant.inventory_id).first()
     if not purchase:
         return jsonify({"error": "Purchase not found"}), 404
     return jsonify(purchase.serialize()), 200
 
 @purchases_api.route('/purchases', methods=['POST'])
+@jwt_required()
 def create_purchase():
-    data = request.get_json()
-    required_fields = ['numero_comprobante','orden_compra','metodo','inventory_id','provider_id', 'product_id', 'quantity', 'total']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({"error": f"{field} is required"}),
-
-    purchase = Purchase(
-        orden_compra=data['orden_compra'],
-        metodo=data['metodo'],
-        provider_id=data['provider_id'],
-        product_id=data['product_id'],
-        inventory_id=data['inventory_id'],
-        quantity=data['quantity'],
-        total=data['total']
-    )
-    purchase.save()
-
-    inventory = purchase.inventory
-    user_id = inventory.user_id if inventory else None
-    monto_base = purchase.total
-    impuesto_aplicado = monto_base * 0.19
-    total_final = monto_base - impuesto_aplicado
-
-
-    # Logica para crear la factura al momento de registrar la compra
-    invoice = Invoice(
-        purchase_id = purchase.id,
-        user_id=user_id,
-        inventory_id=purchase.inventory_id,
-        numero_comprobante=data['numero_cmoprobante'],
-        monto_base=monto_base,
-        impuesto_aplicado=impuesto_aplicado,
-        total_final=total_final,
-        status=data['status']        
-    )
-    invoice.save()
-
-    # Registrar el movimiento de la compra en el inventario
-
-    movement = Movement(
-        prodcut_id=purchase.product_id,
-        inventory_id=purchase.inventory_id,
-        type=data['type'],
-        quantity=purchase.quantity,
-        purchase_id=purchase.id
-    )
-    movement.save()
-
-
-    return jsonify(purchase.serialize()), 201
-
-
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Se espera una compra"}), 400
+    return _register([data], single=True)
+
+# Recepción de mercadería: varias compras en una sola transacción
+# Body: {"provider_id": 1, "metodo": "...", "items": [{"orden_compra": "...", "product_id": 1, "quantity": 5, "total": 1000}, ...]}
+# Los campos del encabezado se aplican a cada línea que no los traiga
+@purchases_api.route('/purchases/batch', methods=['POST'])
+@jwt_required()
+def create_purchases_batch():
+    data = request.get_json(silent=True)
+    if isinstance(data, list):
+        header, items = {}, data
+    elif isinstance(data, dict):
+        header, items = {k: v for k, v in data.items() if k != "items"}, data.get("items")
+    else:
+        header, items = {}, None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items debe ser una lista con al menos una compra"}), 400
+    if len(items) > MAX_LINES:
+        return jsonify({"error": f"Máximo {MAX_LINES} líneas por recepción"}), 400
+    lines = [{**header, **item} if isinstance(item, dict) else item for item in items]
+    return _register(lines)
+
+def _register(lines, single=False):
+    tenant = get_current_tenant()
+    if not tenant:
+        return jsonify({"error": "User not found"}), 404
+    if not tenant.inventory_id:
+        return jsonify({"error": "No inventory found for the user"}), 400
+
+    try:
+        purchases = register_purchases(lines, tenant)
+        response = [purchase.serialize() for purchase in purchases]
+        db.session.commit()
+    except PurchaseError as e:
+        db.session.rollback()
+        if single:
+            return jsonify({"error": e.errors[0]["error"]}), 400
+        return jsonify({"error": "Compras inválidas", "errors": e.errors}), 400
+    except StockError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error al registrar la compra: {e}")
+        return jsonify({"error": "Error al registrar la compra", "details": str(e)}), 500
+
+    return jsonify(response[0] if single else response), 201
+
+
+
+# Solo los movimientos con saldo (balance) pasaron por el libro de stock; las compras
+# anteriores al libro no sumaron stock, así que tampoco se les descuenta al editarlas o eliminarlas.
+# El libro es de solo agregar: los movimientos se anulan con ajustes, no se editan ni se borran
+def _ledger_movements(purchase):
+    return [movement for movement in purchase.movements if movement.balance is not None]
 
 @purchases_api.route('/purchases/<int:id>', methods=['PUT'])
+@jwt_required()
 def update_purchase(id):
-    purchase = Purchase.find_by_id(id)
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
+        return jsonify({"error": "User or inventory not found"}), 404
+
+    purchase = Purchase.query.filter_by(id=id, inventory_id=tenant.inventory_id).first()
     if not purchase:
         return jsonify({"error": "Purchase not found"}), 404
     data = request.get_json()
-    purchase.provider_id = data.get('provider_id', purchase.provider_id)
-    purchase.product_id = data.get('product_id', purchase.product_id)
-    purchase.quantity = data.get('quantity', purchase.quantity)
-    purchase.total = data.get('total', purchase.total)
-    purchase.update()
+
+    try:
+        product_id = int(data.get('product_id', purchase.product_id))
+        quantity = int(data.get('quantity', purchase.quantity))
+    except (TypeError, ValueError):
+        return jsonify({"error": "product_id y quantity deben ser enteros"}), 400
+    if quantity <= 0:
+        return jsonify({"error": "quantity debe ser mayor que 0"}), 400
+    if product_id != purchase.product_id and not Product.query.filter_by(
+        id=product_id, inventory_id=tenant.inventory_id
+    ).first():
+        return jsonify({"error": "Producto no encontrado"}), 404
+
+    try:
+        ledger = _ledger_movements(purchase)
+        if ledger and (product_id != purchase.product_id or quantity != purchase.quantity):
+            # Se registra la nueva entrada y se anula la anterior en la misma transacción
+            # (primero la entrada, para no fallar por stock insuficiente al bajar la cantidad)
+            record_movement(product_id, tenant.inventory_id, "compra", quantity,
+                            registered_by=tenant.user_id, purchase_id=purchase.id)
+            compensate_movements(ledger, tenant.inventory_id, registered_by=tenant.user_id)
+        purchase.provider_id = data.get('provider_id', purchase.provider_id)
+        purchase.product_id = product_id
+        purchase.quantity = quantity
+        purchase.total = data.get('total', purchase.total)
+        purchase.update()
+    except StockError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 409 if isinstance(e, InsufficientStock) else 400
     return jsonify(purchase.serialize()), 200
 
 @purchases_api.route('/purchases/<int:id>', methods=['DELETE'])
+@jwt_required()
 def delete_purchase(id):
-    purchase = Purchase.find_by_id(id)
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
+        return jsonify({"error": "User or inventory not found"}), 404
+
+    purchase = Purchase.query.filter_by(id=id, inventory_id=tenant.inventory_id).first()
     if not purchase:
         return jsonify({"error": "Purchase not found"}), 404
-    purchase.delete()
+
+    try:
+        # Se descuenta del stock lo que la compra había ingresado (con ajustes) y
+        # el historial de movimientos se conserva, sin la referencia a la compra eliminada
+        adjustments = compensate_movements(_ledger_movements(purchase), tenant.inventory_id,
+                                           registered_by=tenant.user_id)
+        for movement in list(purchase.movements) + adjustments:
+            movement.purchase_id = None
+        db.session.flush()
+        db.session.expire(purchase, ["movements"])
+        if purchase.invoice:
+            db.session.delete(purchase.invoice)
+        purchase.delete()
+    except StockError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 409 if isinstance(e, InsufficientStock) else 400
     return jsonify({"message": "Purchase deleted"}), 200
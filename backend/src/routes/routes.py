@@ -1,15 +1,14 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, create_access_token, create_refresh_token, get_jwt_identity
-from src.functions import verify_google_token, verify_google_access_token
-from datetime import timedelta
+from src.functions import verify_google_id_token
+from datetime import date, timedelta
+from sqlalchemy.orm import selectinload
 from src.models import (db, User, Profile, Invoice, Inventory, Sale, Purchase, create_inventory_for_user)
-from google.oauth2 import id_token as google_id_token
-from google.auth.transport import requests as google_requests
-import os
-from flask_mail import Message, Mail
+from src.tenant import get_current_tenant, invalidate_tenant
+from src.stock import stock_at, build_snapshots
+from src.mailer import mail_dispatcher
 
 api = Blueprint("api", __name__)
-mail = Mail()
 
 @api.route('/renew-token', methods=['POST'])
 @jwt_required()
@@ -42,8 +41,7 @@ def verificar_token():
         return jsonify({"error": "token is invalid"}), 400
     
     try:
-        client_id = os.getenv('VITE_GOOGLE_CLIENT_ID')
-        idinfo = google_id_token.verify_oauth2_token(token, google_requests.Request(), client_id)
+        idinfo = verify_google_id_token(token)
     except ValueError as e:
         return jsonify({"error": "token is invalid", "details": str(e)}), 400
 
@@ -136,8 +134,7 @@ def google_login():
         return jsonify({"error": "id_token is required"}), 400
 
     try:
-        client_id = os.getenv('VITE_GOOGLE_CLIENT_ID')
-        idinfo = google_id_token.verify_oauth2_token(id_token_received, google_requests.Request(), client_id)
+        idinfo = verify_google_id_token(id_token_received)
     except ValueError as e:
         return jsonify({"error": "Invalid token", "details": str(e)}), 400
 
@@ -210,7 +207,13 @@ def get_created_users():
             admin_id = int(token)
         except ValueError:
             return jsonify({"error": "Token inválido"}), 400
-        users = User.query.filter_by(created_by=admin_id).all()
+        # Perfil e inventario se cargan en dos consultas para toda la lista (sin N+1)
+        users = (
+            User.query
+            .options(selectinload(User.profile), selectinload(User.inventory))
+            .filter_by(created_by=admin_id)
+            .all()
+        )
         return jsonify([user.serialize() for user in users]), 200
     except Exception as e:
         print("Error en get_created_users:", e)
@@ -272,6 +275,7 @@ def update_user(user_id):
         user.last_name = data.get('lastName', user.last_name)
         user.role = data.get('role', user.role)
         db.session.commit()
+        invalidate_tenant(user.id)
         return jsonify({"success": True, "user": user.serialize()}), 200
     except Exception as e:
         db.session.rollback()
@@ -287,6 +291,7 @@ def delete_user(user_id):
             return jsonify({"error": "Usuario no encontrado"}), 404
         db.session.delete(user)
         db.session.commit()
+        invalidate_tenant(user_id)
         return jsonify({"success": True, "message": "Usuario eliminado correctamente"}), 200
     except Exception as e:
         db.session.rollback()
@@ -299,11 +304,10 @@ inventory_api = Blueprint("inventory_api", __name__)
 @inventory_api.route('/inventory', methods=['GET'])
 @jwt_required()
 def get_inventory():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not user.inventory:
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
         return jsonify({"error": "Inventario no encontrado."}), 404
-    return jsonify(user.inventory.serialize()), 200
+    return jsonify({"id": tenant.inventory_id, "user_id": tenant.user_id}), 200
 
 @inventory_api.route('/inventory', methods=['POST'])
 @jwt_required()
@@ -314,6 +318,7 @@ def create_inventory():
         return jsonify({"error": "El inventario ya existe."}), 400
     try:
         create_inventory_for_user(user)
+        invalidate_tenant(user.id)
         return jsonify(user.inventory.serialize()), 201
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
@@ -327,13 +332,54 @@ def delete_inventory():
         return jsonify({"error": "Inventario no encontrado."}), 404
     try:
         user.inventory.delete()
+        invalidate_tenant(user.id)
         return jsonify({"message": "Inventario eliminado"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-mail = Mail()
+# Stock histórico: foto más cercana + delta de movimientos
+@inventory_api.route('/inventory/stock-at', methods=['GET'])
+@jwt_required()
+def get_stock_at():
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
+        return jsonify({"error": "Inventario no encontrado."}), 404
+    try:
+        day = date.fromisoformat(request.args.get('date', ''))
+    except ValueError:
+        return jsonify({"error": "date es requerido con formato YYYY-MM-DD"}), 400
+    product_id = request.args.get('product_id', type=int)
+    stocks = stock_at(tenant.inventory_id, day, product_id)
+    return jsonify({
+        "date": day.isoformat(),
+        "stock": [{"product_id": pid, "stock": stock} for pid, stock in sorted(stocks.items())]
+    }), 200
+
+# Genera la foto de stock del inventario (por defecto, la de ayer)
+@inventory_api.route('/inventory/snapshots', methods=['POST'])
+@jwt_required()
+def create_stock_snapshots():
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
+        return jsonify({"error": "Inventario no encontrado."}), 404
+    data = request.get_json(silent=True) or {}
+    try:
+        day = date.fromisoformat(data['date']) if data.get('date') else date.today() - timedelta(days=1)
+    except ValueError:
+        return jsonify({"error": "date debe tener formato YYYY-MM-DD"}), 400
+    if day >= date.today():
+        return jsonify({"error": "Solo se pueden generar fotos de días anteriores a hoy"}), 400
+    try:
+        count = build_snapshots(tenant.inventory_id, day)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Error al generar la foto de stock", "details": str(e)}), 500
+    return jsonify({"date": day.isoformat(), "products": count}), 201
+
 @api.route('/forgot-password', methods=['POST'])
 def forgot_password():
+    from flask_mail import Message  # Flask-Mail solo se carga si se usa
     data = request.get_json()
     email = data.get('email')
     if not email:
@@ -357,11 +403,10 @@ def forgot_password():
     <p>Atentamente,</p>
     <p>El equipo de soporte LogiGo</p>
     '''
-    try:
-        mail.send(msg)
-        return jsonify({"message": "Password reset link has been sent to your email"}), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    # El envío SMTP se hace en segundo plano; el request no espera al servidor de correo
+    if not mail_dispatcher.send(msg):
+        return jsonify({"error": "El servicio de correo está saturado, intente nuevamente más tarde"}), 503
+    return jsonify({"message": "Password reset link has been sent to your email"}), 200
 
 @api.route('/reset-password/<token>', methods=['POST'])
 def reset_password(token):
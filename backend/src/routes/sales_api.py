@@ -1,34 +1,64 @@
 from flask import Blueprint, jsonify, request
-from src.models import db, Sale, Product, Customer, Inventory, User
+from src.models import db, Sale, SaleOrder, Product, Customer, Inventory
+from src.tenant import get_current_tenant
+from src.pagination import paginate, PaginationError
+from src.stock import record_movement, ledger_net, StockError, InsufficientStock
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
 sales_api = Blueprint("sales_api", __name__)
 
+# Serializa una venta con su cliente y producto ya cargados
+def serialize_sale(sale, customer):
+    return {
+        "id": sale.id,
+        "customer": customer.serialize(),
+        "product": sale.product.serialize(),
+        "quantity": sale.quantity,
+        "total": sale.total,
+        "sale_date": sale.sale_date.isoformat()
+    }
+
 # Obtener todas las ventas del usuario actual
 @sales_api.route('/sales', methods=['GET'])
 @jwt_required()
 def get_sales():
     user_id = get_jwt_identity()
-    sales = Sale.query.filter_by(user_id=user_id).all()
+    # Producto, ubicación y cliente se cargan en la misma consulta (sin N+1)
+    query = (
+        Sale.query
+        .options(
+            joinedload(Sale.product).joinedload(Product.ubicacion),
+            joinedload(Sale.customer)
+        )
+        .filter_by(user_id=user_id)
+    )
+    try:
+        sales, next_cursor = paginate(
+            query, Sale,
+            sortable=("id", "sale_date", "total"),
+            filterable=("product_id", "customer_id")
+        )
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Ventas antiguas sin customer_id: se usa el primer cliente del usuario (una sola consulta)
+    default_customer = None
+    if any(sale.customer is None for sale in sales):
+        default_customer = Customer.query.filter_by(user_id=user_id).first()
 
     result = []
     for sale in sales:
-        customer = Customer.query.filter_by(user_id=sale.user_id).first()
-        product = Product.query.get(sale.product_id)
-
-        if not customer or not product:
+        customer = sale.customer or default_customer
+        if not customer or not sale.product:
             continue  # Saltar si faltan datos para evitar errores
+        result.append(serialize_sale(sale, customer))
 
-        result.append({
-            "id": sale.id,
-            "customer": customer.serialize(),
-            "product": product.serialize(),
-            "quantity": sale.quantity,
-            "total": sale.total,
-            "sale_date": sale.sale_date.isoformat()
-        })
-
-    return jsonify(result), 200
+    response = jsonify(result)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
 
 # Crear una nueva venta
 @sales_api.route('/sales', methods=['POST'])
@@ -44,11 +74,19 @@ def create_sale():
     if missing_fields:
         return jsonify({"error": f"Campos faltantes: {', '.join(missing_fields)}"}), 400
 
-    customer = Customer.query.get(data['customer_id'])
+    try:
+        quantity = int(data['quantity'])
+    except (TypeError, ValueError):
+        return jsonify({"error": "quantity debe ser un número entero"}), 400
+    if quantity <= 0:
+        return jsonify({"error": "quantity debe ser mayor que 0"}), 400
+
+    # Cliente y producto deben pertenecer al usuario: la venta descuenta stock de ese producto
+    customer = Customer.query.filter_by(id=data['customer_id'], user_id=user_id).first()
     if not customer:
         return jsonify({"error": "Cliente no encontrado"}), 404
 
-    product = Product.query.get(data['product_id'])
+    product = Product.query.filter_by(id=data['product_id'], user_id=user_id).first()
     if not product:
         return jsonify({"error": "Producto no encontrado"}), 404
 
@@ -56,27 +94,120 @@ def create_sale():
     if not inventory:
         return jsonify({"error": "Inventario no encontrado para este producto"}), 404
 
-    total = product.precio * int(data['quantity'])
+    total = product.precio * quantity
 
     sale = Sale(
         user_id=user_id,
         inventory_id=inventory.id,
         product_id=product.id,
-        quantity=int(data['quantity']),
+        customer_id=customer.id,
+        quantity=quantity,
         total=total
     )
 
     db.session.add(sale)
+    # Descuenta el stock en la misma transacción que la venta
+    try:
+        sale.movements.append(
+            record_movement(product.id, inventory.id, "venta", quantity, registered_by=user_id)
+        )
+    except InsufficientStock as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 409
     db.session.commit()
 
-    return jsonify({
-        "id": sale.id,
-        "customer": customer.serialize(),
-        "product": product.serialize(),
-        "quantity": sale.quantity,
-        "total": sale.total,
-        "sale_date": sale.sale_date.isoformat()
-    }), 201
+    return jsonify(serialize_sale(sale, customer)), 201
+
+# Venta con varios productos en una sola transacción
+# Body: {"customer_id": 1, "items": [{"product_id": 1, "quantity": 2}, ...]}
+@sales_api.route('/sales/checkout', methods=['POST'])
+@jwt_required()
+def checkout():
+    data = request.get_json(silent=True) or {}
+    items = data.get("items")
+    if not data.get("customer_id"):
+        return jsonify({"error": "customer_id is required"}), 400
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items debe ser una lista con al menos un producto"}), 400
+
+    # Cantidades por producto (las líneas repetidas se suman)
+    quantities = {}
+    for position, item in enumerate(items):
+        try:
+            product_id = int(item["product_id"])
+            quantity = int(item["quantity"])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": f"Línea {position}: product_id y quantity deben ser enteros"}), 400
+        if quantity <= 0:
+            return jsonify({"error": f"Línea {position}: quantity debe ser mayor que 0"}), 400
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
+        return jsonify({"error": "User or inventory not found"}), 404
+
+    customer = Customer.query.filter_by(id=data["customer_id"], user_id=tenant.user_id).first()
+    if not customer:
+        return jsonify({"error": "Cliente no encontrado"}), 404
+
+    # Todos los productos en una sola consulta
+    products = {
+        product.id: product
+        for product in Product.query.options(joinedload(Product.ubicacion)).filter(
+            Product.id.in_(quantities), Product.user_id == tenant.user_id
+        )
+    }
+    missing = sorted(set(quantities) - set(products))
+    if missing:
+        return jsonify({"error": "Productos no encontrados", "product_ids": missing}), 404
+
+    order = SaleOrder(
+        user_id=tenant.user_id,
+        inventory_id=tenant.inventory_id,
+        customer_id=customer.id,
+        total=sum(products[pid].precio * quantity for pid, quantity in quantities.items())
+    )
+    db.session.add(order)
+    try:
+        # Orden fijo por producto: dos checkouts simultáneos bloquean las filas en el mismo orden.
+        # Sin autoflush, las líneas y movimientos se insertan juntos (por lotes) en el flush final
+        with db.session.no_autoflush:
+            for product_id in sorted(quantities):
+                quantity = quantities[product_id]
+                product = products[product_id]
+                movement = record_movement(product_id, tenant.inventory_id, "venta", quantity, registered_by=tenant.user_id)
+                # Stock ya conocido por el UPDATE ... RETURNING; evita recargar cada producto
+                set_committed_value(product, "stock", movement.balance)
+                order.lines.append(Sale(
+                    user_id=tenant.user_id,
+                    inventory_id=tenant.inventory_id,
+                    product=product,
+                    customer_id=customer.id,
+                    quantity=quantity,
+                    total=product.precio * quantity,
+                    movements=[movement]
+                ))
+        db.session.flush()
+        response = {
+            **order.serialize(),
+            "customer": customer.serialize(),
+            "items": [serialize_sale(sale, customer) for sale in order.lines]
+        }
+        db.session.commit()
+    except InsufficientStock as e:
+        db.session.rollback()
+        return jsonify({"error": str(e), "product_id": e.product_id}), 409
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error en el checkout: {e}")
+        return jsonify({"error": "Error al registrar la venta", "details": str(e)}), 500
+
+    return jsonify(response), 201
+
+# Unidades que la venta descontó del stock a través del libro de stock
+# (las ventas anteriores al libro no descontaron nada)
+def _taken(sale):
+    return -sum(ledger_net(sale.movements).values())
 
 # Actualizar venta existente
 @sales_api.route('/sales/<int:id>', methods=['PUT'])
@@ -91,19 +222,36 @@ def update_sale(id):
     data = request.get_json()
 
     if 'quantity' in data:
-        sale.quantity = int(data['quantity'])
+        try:
+            quantity = int(data['quantity'])
+        except (TypeError, ValueError):
+            return jsonify({"error": "quantity debe ser un número entero"}), 400
+        if quantity <= 0:
+            return jsonify({"error": "quantity debe ser mayor que 0"}), 400
+        # La diferencia se registra como venta adicional o devolución
+        diff = quantity - sale.quantity
+        try:
+            if diff > 0:
+                sale.movements.append(
+                    record_movement(sale.product_id, sale.inventory_id, "venta", diff, registered_by=user_id)
+                )
+            elif diff < 0:
+                # Solo vuelve al stock lo que la venta realmente descontó
+                returned = min(-diff, _taken(sale))
+                if returned > 0:
+                    sale.movements.append(
+                        record_movement(sale.product_id, sale.inventory_id, "devolucion", returned, registered_by=user_id)
+                    )
+        except StockError as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), 409
+        sale.quantity = quantity
         sale.total = sale.product.precio * sale.quantity
 
     db.session.commit()
 
-    return jsonify({
-        "id": sale.id,
-        "customer": Customer.query.filter_by(user_id=sale.user_id).first().serialize(),
-        "product": sale.product.serialize(),
-        "quantity": sale.quantity,
-        "total": sale.total,
-        "sale_date": sale.sale_date.isoformat()
-    }), 200
+    customer = sale.customer or Customer.query.filter_by(user_id=sale.user_id).first()
+    return jsonify(serialize_sale(sale, customer)), 200
 
 # Eliminar una venta existente
 @sales_api.route('/sales/<int:id>', methods=['DELETE'])
@@ -115,6 +263,13 @@ def delete_sale(id):
     if not sale:
         return jsonify({"error": "Venta no encontrada"}), 404
 
+    # Devuelve al stock solo lo que la venta descontó a través del libro de stock
+    taken = _taken(sale)
+    if taken > 0:
+        record_movement(sale.product_id, sale.inventory_id, "devolucion", taken, registered_by=user_id)
+    # El historial de movimientos se conserva, sin la referencia a la venta eliminada
+    for movement in list(sale.movements):
+        movement.sale = None
     db.session.delete(sale)
     db.session.commit()
 
@@ -1,29 +1,32 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models import db, Ubicacion, User
+from flask_jwt_extended import jwt_required
+from src.models import db, Ubicacion
+from src.tenant import get_current_tenant
+from src.pagination import paginated_response
+from src.etags import conditional_get, mark_changed, UBICACIONES, PRODUCTS
+from src.product_cache import mark_product_changed
 
 ubications_api = Blueprint("ubications_api", __name__)
 
 # Obtener todas las ubicaciones del inventario del usuario autenticado
 @ubications_api.route('/ubicaciones', methods=['GET'])
 @jwt_required()
+@conditional_get(UBICACIONES, lambda tenant: tenant.inventory_id)
 def get_ubicaciones():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not user.inventory:
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
         return jsonify({"error": "Usuario o inventario no encontrado"}), 404
-    ubicaciones = Ubicacion.query.filter_by(inventory_id=user.inventory.id).all()
-    return jsonify([ubicacion.serialize() for ubicacion in ubicaciones]), 200
+    query = Ubicacion.query.filter_by(inventory_id=tenant.inventory_id)
+    return paginated_response(query, Ubicacion, sortable=("id", "nombre"), filterable=("nombre",))
 
 # Obtener una ubicación específica por su ID (solo si pertenece al inventario del usuario)
 @ubications_api.route('/ubicaciones/<int:id>', methods=['GET'])
 @jwt_required()
 def get_ubicacion(id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not user.inventory:
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
         return jsonify({"error": "Usuario o inventario no encontrado"}), 404
-    ubicacion = Ubicacion.query.filter_by(id=id, inventory_id=user.inventory.id).first()
+    ubicacion = Ubicacion.query.filter_by(id=id, inventory_id=tenant.inventory_id).first()
     if not ubicacion:
         return jsonify({"error": "Ubicación no encontrada"}), 404
     return jsonify(ubicacion.serialize()), 200
@@ -32,9 +35,8 @@ def get_ubicacion(id):
 @ubications_api.route('/ubicaciones', methods=['POST'])
 @jwt_required()
 def create_ubicacion():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not user.inventory:
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
         return jsonify({"error": "Usuario o inventario no encontrado"}), 404
 
     data = request.get_json()
@@ -43,8 +45,9 @@ def create_ubicacion():
         return jsonify({"error": "El nombre es requerido"}), 400
     descripcion = data.get("descripcion", "")
     
-    new_ubicacion = Ubicacion(nombre=nombre, descripcion=descripcion, inventory_id=user.inventory.id)
+    new_ubicacion = Ubicacion(nombre=nombre, descripcion=descripcion, inventory_id=tenant.inventory_id)
     try:
+        mark_changed(UBICACIONES, tenant.inventory_id)
         new_ubicacion.save()
     except Exception as e:
         return jsonify({"error": "Error al crear la ubicación", "details": str(e)}), 500
@@ -55,12 +58,11 @@ def create_ubicacion():
 @ubications_api.route('/ubicaciones/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_ubicacion(id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not user.inventory:
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
         return jsonify({"error": "Usuario o inventario no encontrado"}), 404
 
-    ubicacion = Ubicacion.query.filter_by(id=id, inventory_id=user.inventory.id).first()
+    ubicacion = Ubicacion.query.filter_by(id=id, inventory_id=tenant.inventory_id).first()
     if not ubicacion:
         return jsonify({"error": "Ubicación no encontrada"}), 404
 
@@ -71,6 +73,10 @@ def update_ubicacion(id):
         ubicacion.descripcion = data["descripcion"]
 
     try:
+        # Los productos incluyen su ubicación serializada
+        mark_changed(UBICACIONES, tenant.inventory_id)
+        mark_changed(PRODUCTS, tenant.user_id)
+        mark_product_changed(tenant.user_id)
         ubicacion.update()
     except Exception as e:
         return jsonify({"error": "Error al actualizar la ubicación", "details": str(e)}), 500
@@ -81,16 +87,18 @@ def update_ubicacion(id):
 @ubications_api.route('/ubicaciones/<int:id>', methods=['DELETE'])
 @jwt_required()
 def delete_ubicacion(id):
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not user.inventory:
+    tenant = get_current_tenant()
+    if not tenant or not tenant.inventory_id:
         return jsonify({"error": "Usuario o inventario no encontrado"}), 404
 
-    ubicacion = Ubicacion.query.filter_by(id=id, inventory_id=user.inventory.id).first()
+    ubicacion = Ubicacion.query.filter_by(id=id, inventory_id=tenant.inventory_id).first()
     if not ubicacion:
         return jsonify({"error": "Ubicación no encontrada"}), 404
 
     try:
+        mark_changed(UBICACIONES, tenant.inventory_id)
+        mark_changed(PRODUCTS, tenant.user_id)
+        mark_product_changed(tenant.user_id)
         ubicacion.delete()
     except Exception as e:
         return jsonify({"error": "Error al eliminar la ubicación", "details": str(e)}), 500
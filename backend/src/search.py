@@ -0,0 +1,168 @@
+import bisect
+import difflib
+import re
+import threading
+from collections import Counter, OrderedDict
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import joinedload
+from src.models import db, Product
+from src.etags import get_version, PRODUCT_SEARCH
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Similitud mínima para coincidencias aproximadas en nombre
+FUZZY_CUTOFF = 0.75
+# Catálogos indexados en memoria por proceso (fallback sin Postgres)
+MAX_INDEXES = 64
+
+_WORD = re.compile(r"\w+")
+
+
+def _words(text):
+    return _WORD.findall((text or "").lower())
+
+
+def _prefixed(entries, prefix, exact=False):
+    """Ids de las entradas (clave, id) ordenadas cuya clave empieza con `prefix` (o es igual)."""
+    ids = []
+    for i in range(bisect.bisect_left(entries, (prefix,)), len(entries)):
+        key, item_id = entries[i]
+        if key != prefix and (exact or not key.startswith(prefix)):
+            break
+        ids.append(item_id)
+    return ids
+
+
+class ProductIndex:
+    """
+    Índice en memoria del catálogo de un usuario: códigos y palabras del nombre
+    en listas ordenadas (búsqueda por prefijo con bisect) y el vocabulario para
+    coincidencias aproximadas.
+    """
+
+    def __init__(self, rows):
+        self.categories = {}
+        self.codes = []
+        self.words = []
+        for product_id, codigo, nombre, categoria in rows:
+            self.categories[product_id] = categoria
+            self.codes.append(((codigo or "").lower(), product_id))
+            for word in set(_words(nombre)):
+                self.words.append((word, product_id))
+        self.codes.sort()
+        self.words.sort()
+        # Vocabulario por primera letra: acota las comparaciones aproximadas
+        self.vocabulary = {}
+        for word in sorted({word for word, _ in self.words}):
+            if word.isalpha():
+                self.vocabulary.setdefault(word[0], []).append(word)
+
+    def _word_matches(self, term):
+        ids = set(_prefixed(self.words, term))
+        if ids or len(term) < 3 or not term.isalpha():
+            return ids, False
+        # Sin coincidencias por prefijo: se prueba con palabras parecidas (errores de tipeo)
+        candidates = [word for word in self.vocabulary.get(term[0], ()) if abs(len(word) - len(term)) <= 2]
+        for word in difflib.get_close_matches(term, candidates, n=5, cutoff=FUZZY_CUTOFF):
+            ids.update(_prefixed(self.words, word, exact=True))
+        return ids, True
+
+    def search(self, q, categoria=None):
+        """Retorna los ids ordenados por relevancia y el conteo por categoría."""
+        q = q.lower()
+        ranks = {}
+        for product_id in _prefixed(self.codes, q):
+            ranks[product_id] = 1
+        for product_id in _prefixed(self.codes, q, exact=True):
+            ranks[product_id] = 0
+
+        terms = _words(q)
+        if terms:
+            matched, fuzzy = None, False
+            for term in terms:
+                ids, term_fuzzy = self._word_matches(term)
+                matched = ids if matched is None else matched & ids
+                fuzzy = fuzzy or term_fuzzy
+            for product_id in matched:
+                ranks.setdefault(product_id, 3 if fuzzy else 2)
+
+        facets = Counter(self.categories[product_id] for product_id in ranks)
+        if categoria:
+            ranks = {product_id: rank for product_id, rank in ranks.items()
+                     if self.categories[product_id] == categoria}
+        ordered = sorted(ranks, key=lambda product_id: (ranks[product_id], product_id))
+        return ordered, facets
+
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def _get_index(user_id):
+    # Versión propia de la búsqueda: las ventas y movimientos de stock no reconstruyen el índice
+    version = get_version(PRODUCT_SEARCH, user_id)
+    with _lock:
+        cached = _indexes.get(user_id)
+        if cached and cached[0] == version:
+            _indexes.move_to_end(user_id)
+            return cached[1]
+
+    rows = db.session.query(Product.id, Product.codigo, Product.nombre, Product.categoria).filter(
+        Product.user_id == user_id
+    ).all()
+    index = ProductIndex(rows)
+    with _lock:
+        _indexes[user_id] = (version, index)
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def _search_memory(user_id, q, categoria, limit):
+    ids, facets = _get_index(user_id).search(q, categoria)
+    page = ids[:limit]
+    products = {}
+    if page:
+        products = {
+            product.id: product
+            for product in Product.query.options(joinedload(Product.ubicacion)).filter(Product.id.in_(page))
+        }
+    items = [products[product_id] for product_id in page if product_id in products]
+    return items, len(ids), facets
+
+
+def _search_postgres(user_id, q, categoria, limit):
+    pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    code_prefix = Product.codigo.ilike(pattern + "%")
+    # `%` es el operador de similitud de pg_trgm (usa el índice GIN de nombre)
+    name_match = or_(Product.nombre.ilike("%" + pattern + "%"), Product.nombre.op("%")(q))
+    filters = [Product.user_id == user_id, or_(code_prefix, name_match)]
+
+    facets = Counter(dict(
+        db.session.query(Product.categoria, func.count(Product.id)).filter(*filters).group_by(Product.categoria)
+    ))
+    if categoria:
+        filters.append(Product.categoria == categoria)
+
+    rank = case((func.lower(Product.codigo) == q.lower(), 0), (code_prefix, 1), else_=2)
+    items = (
+        Product.query.options(joinedload(Product.ubicacion))
+        .filter(*filters)
+        .order_by(rank, func.similarity(Product.nombre, q).desc(), Product.id)
+        .limit(limit)
+        .all()
+    )
+    total = facets.get(categoria, 0) if categoria else sum(facets.values())
+    return items, total, facets
+
+
+def search_products(user_id, q, categoria=None, limit=DEFAULT_LIMIT):
+    """
+    Busca productos por prefijo de código y por nombre (prefijo de palabras o
+    aproximado). Retorna (productos, total, conteo por categoría).
+    """
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    if db.engine.dialect.name == "postgresql":
+        return _search_postgres(user_id, q, categoria, limit)
+    return _search_memory(user_id, q, categoria, limit)
@@ -0,0 +1,84 @@
+import os
+import threading
+from flask import current_app
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from src.models import db, DocumentSequence
+
+# Tipos de documento con folio propio
+COMPROBANTE = "comprobante"  # Invoice.numero_comprobante
+NOTA = "nota"                # Invoice.numero_nota
+COMPRA = "compra"            # Invoice.numero_comprobante de las facturas de compra
+
+PREFIXES = {COMPROBANTE: "F", NOTA: "NC", COMPRA: "FC"}
+# El user_id va en el folio porque numero_comprobante y numero_nota son únicos en toda la tabla
+NUMBER_FORMAT = "{prefix}-{user_id}-{value:06d}"
+
+# Bloques reservados por este proceso: (user_id, doc_type) -> [próximo, fin)
+_blocks = {}
+_lock = threading.Lock()
+_pid = None
+
+
+def _reserve(user_id, doc_type, count):
+    """
+    Reserva `count` números consecutivos en una transacción corta aparte y
+    retorna el primero. El UPDATE ... RETURNING bloquea la fila del contador
+    solo durante esa transacción, no durante la de la factura.
+    """
+    table = DocumentSequence.__table__
+    where = (table.c.user_id == user_id) & (table.c.doc_type == doc_type)
+    stmt = update(table).where(where).values(next_value=table.c.next_value + count).returning(table.c.next_value)
+    with db.engine.begin() as connection:
+        end = connection.execute(stmt).scalar()
+        if end is None:
+            try:
+                with connection.begin_nested():
+                    connection.execute(insert(table).values(user_id=user_id, doc_type=doc_type, next_value=1 + count))
+                return 1
+            except IntegrityError:
+                # Otro proceso creó el contador en paralelo
+                end = connection.execute(stmt).scalar()
+    return end - count
+
+
+def allocate_numbers(user_id, doc_type, count=1):
+    """
+    Asigna `count` folios del usuario para el tipo de documento.
+    Con DOC_SEQUENCE_BLOCK > 1 cada proceso reserva los números de a bloques y
+    los entrega desde memoria; los números no usados de un bloque (o de una
+    factura que no se guardó) quedan como saltos en la numeración.
+    """
+    global _pid
+    if count <= 0:
+        return []
+    user_id = int(user_id)
+    block_size = max(current_app.config.get("DOC_SEQUENCE_BLOCK", 1), 1)
+    key = (user_id, doc_type)
+
+    values = []
+    with _lock:
+        if _pid != os.getpid():
+            # Proceso hijo (fork): los bloques del padre no se comparten
+            _blocks.clear()
+            _pid = os.getpid()
+        start, end = _blocks.get(key, (0, 0))
+        take = min(count, end - start)
+        values.extend(range(start, start + take))
+        _blocks[key] = (start + take, end)
+
+    missing = count - len(values)
+    if missing:
+        reserve = max(missing, block_size)
+        first = _reserve(user_id, doc_type, reserve)
+        values.extend(range(first, first + missing))
+        if reserve > missing:
+            with _lock:
+                _blocks[key] = (first + missing, first + reserve)
+
+    prefix = PREFIXES.get(doc_type, doc_type[:2].upper())
+    return [NUMBER_FORMAT.format(prefix=prefix, user_id=user_id, value=value) for value in values]
+
+
+def next_number(user_id, doc_type):
+    return allocate_numbers(user_id, doc_type)[0]
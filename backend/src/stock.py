@@ -0,0 +1,238 @@
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import update, insert, case, func
+from src.models import db, Product, Movement, StockSnapshot
+from src.etags import mark_changed, PRODUCTS
+from src.product_cache import mark_product_changed
+
+# Tipos de movimiento que suman o restan stock (se comparan en minúscula)
+INBOUND_TYPES = {"ingreso", "compra", "devolucion", "devolución"}
+OUTBOUND_TYPES = {"venta", "salida", "egreso"}
+# En los ajustes la cantidad ya viene con signo
+ADJUSTMENT_TYPES = {"ajuste"}
+
+
+class StockError(ValueError):
+    pass
+
+
+class InsufficientStock(StockError):
+    def __init__(self, product_id):
+        super().__init__(f"Stock insuficiente para el producto {product_id}")
+        self.product_id = product_id
+
+
+def signed_quantity(movement_type, quantity):
+    kind = (movement_type or "").strip().lower()
+    try:
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        raise StockError("quantity debe ser un número entero")
+    if kind in ADJUSTMENT_TYPES:
+        return quantity
+    if quantity < 0:
+        raise StockError("quantity no puede ser negativa")
+    if kind in INBOUND_TYPES:
+        return quantity
+    if kind in OUTBOUND_TYPES:
+        return -quantity
+    raise StockError(f"Tipo de movimiento inválido: {movement_type}")
+
+
+def apply_stock_change(product_id, delta, inventory_id=None):
+    """
+    Suma `delta` al stock del producto con un único UPDATE atómico.
+    Si el stock quedaría negativo no se modifica nada y se lanza InsufficientStock,
+    por lo que dos ventas concurrentes no pueden vender más de lo disponible.
+    Retorna el stock resultante.
+    """
+    stmt = update(Product).where(Product.id == product_id)
+    if inventory_id is not None:
+        stmt = stmt.where(Product.inventory_id == inventory_id)
+    if delta < 0:
+        stmt = stmt.where(Product.stock + delta >= 0)
+    stmt = stmt.values(stock=Product.stock + delta).returning(Product.stock, Product.user_id, Product.codigo)
+    row = db.session.execute(stmt, execution_options={"synchronize_session": False}).one_or_none()
+    if row is None:
+        exists = db.session.query(Product.id).filter(Product.id == product_id)
+        if inventory_id is not None:
+            exists = exists.filter(Product.inventory_id == inventory_id)
+        if exists.first() is None:
+            raise StockError("Producto no encontrado")
+        raise InsufficientStock(product_id)
+    balance, user_id, codigo = row
+    mark_changed(PRODUCTS, user_id)
+    mark_product_changed(user_id, codigo)
+
+    # Mantener coherente la instancia ya cargada en la sesión, si existe
+    product = db.session.identity_map.get(db.session.identity_key(Product, product_id))
+    if product is not None:
+        db.session.expire(product, ["stock"])
+    return balance
+
+
+def record_movement(product_id, inventory_id, movement_type, quantity, registered_by=None, purchase_id=None,
+                    sale_id=None):
+    """
+    Registra un movimiento y aplica su efecto sobre Product.stock en la misma transacción.
+    El movimiento guarda el saldo resultante (balance). No hace commit.
+    """
+    delta = signed_quantity(movement_type, quantity)
+    balance = apply_stock_change(product_id, delta, inventory_id=inventory_id)
+    movement = Movement(
+        product_id=product_id,
+        inventory_id=inventory_id,
+        type=movement_type,
+        quantity=int(quantity),
+        balance=balance,
+        registered_by=registered_by,
+        purchase_id=purchase_id,
+        sale_id=sale_id
+    )
+    db.session.add(movement)
+    return movement
+
+
+def ledger_net(movements):
+    """
+    Efecto neto por producto de los movimientos que pasaron por el libro de stock.
+    Los movimientos sin saldo (balance) son anteriores al libro y no cuentan.
+    """
+    net = {}
+    for movement in movements:
+        if movement.balance is not None:
+            net[movement.product_id] = net.get(movement.product_id, 0) + signed_quantity(movement.type, movement.quantity)
+    return net
+
+
+def compensate_movements(movements, inventory_id, registered_by=None):
+    """
+    Anula movimientos del libro registrando, por cada uno, un ajuste inverso que
+    apunta al original (reverses_id) y conserva su venta o compra. El libro es de
+    solo agregar: los movimientos no se editan ni se borran, así stock_at y las
+    fotos diarias siguen cuadrando con Product.stock. Se omiten los movimientos
+    anteriores al libro, los ajustes de anulación y los ya anulados. No hace commit.
+    """
+    candidates = [m for m in movements if m.balance is not None and m.reverses_id is None]
+    if not candidates:
+        return []
+    reverted = {movement_id for (movement_id,) in db.session.query(Movement.reverses_id).filter(
+        Movement.reverses_id.in_([m.id for m in candidates])
+    )}
+    adjustments = []
+    for movement in candidates:
+        delta = signed_quantity(movement.type, movement.quantity)
+        if movement.id in reverted or not delta:
+            continue
+        adjustment = record_movement(
+            movement.product_id, inventory_id, "ajuste", -delta, registered_by=registered_by,
+            purchase_id=movement.purchase_id, sale_id=movement.sale_id
+        )
+        adjustment.reverses_id = movement.id
+        adjustments.append(adjustment)
+    return adjustments
+
+
+def is_reverted(movement):
+    return db.session.query(Movement.id).filter(Movement.reverses_id == movement.id).first() is not None
+
+
+def signed_quantity_expr():
+    """Equivalente SQL de signed_quantity() para agregar movimientos en la base de datos."""
+    kind = func.lower(Movement.type)
+    return case(
+        (kind.in_(INBOUND_TYPES | ADJUSTMENT_TYPES), Movement.quantity),
+        (kind.in_(OUTBOUND_TYPES), -Movement.quantity),
+        else_=0
+    )
+
+
+def _end_of(day):
+    # Límite exclusivo: inicio del día siguiente
+    return datetime.combine(day + timedelta(days=1), time.min)
+
+
+def _ledger_deltas(inventory_id, product_id=None):
+    """
+    Delta de stock por producto de los movimientos del libro de stock. Los movimientos
+    sin saldo (balance) son anteriores al libro y nunca modificaron Product.stock.
+    """
+    query = db.session.query(Movement.product_id, func.sum(signed_quantity_expr())).filter(
+        Movement.inventory_id == inventory_id,
+        Movement.balance.isnot(None)
+    )
+    if product_id is not None:
+        query = query.filter(Movement.product_id == product_id)
+    return query
+
+
+def _stock_from_nearest_snapshot(inventory_id, day, product_id=None):
+    """
+    Stock por producto al final de `day`: la foto más cercana anterior o igual
+    a `day` más el delta de los movimientos posteriores a ella. Sin foto previa se
+    parte del stock actual (Product.stock, que incluye el stock cargado antes del
+    libro de movimientos) menos los movimientos posteriores a `day`.
+    Retorna (stocks, fecha_de_la_foto).
+    """
+    snapshot_date = db.session.query(func.max(StockSnapshot.snapshot_date)).filter(
+        StockSnapshot.inventory_id == inventory_id,
+        StockSnapshot.snapshot_date <= day
+    ).scalar()
+
+    if snapshot_date is None:
+        current = db.session.query(Product.id, Product.stock).filter(Product.inventory_id == inventory_id)
+        if product_id is not None:
+            current = current.filter(Product.id == product_id)
+        stocks = {pid: stock or 0 for pid, stock in current}
+        later = _ledger_deltas(inventory_id, product_id).filter(Movement.date >= _end_of(day))
+        for pid, delta in later.group_by(Movement.product_id):
+            if pid in stocks:
+                stocks[pid] -= int(delta or 0)
+        return stocks, None
+
+    query = db.session.query(StockSnapshot.product_id, StockSnapshot.stock).filter_by(
+        inventory_id=inventory_id, snapshot_date=snapshot_date
+    )
+    if product_id is not None:
+        query = query.filter_by(product_id=product_id)
+    stocks = dict(query.all())
+
+    deltas = _ledger_deltas(inventory_id, product_id).filter(
+        Movement.date >= _end_of(snapshot_date),
+        Movement.date < _end_of(day)
+    )
+    for pid, delta in deltas.group_by(Movement.product_id):
+        stocks[pid] = stocks.get(pid, 0) + int(delta or 0)
+    return stocks, snapshot_date
+
+
+def stock_at(inventory_id, day, product_id=None):
+    """Stock histórico al final de `day`, sin recorrer todo el historial de movimientos."""
+    stocks, _ = _stock_from_nearest_snapshot(inventory_id, day, product_id)
+    if product_id is not None:
+        return {product_id: stocks.get(product_id, 0)}
+    return stocks
+
+
+def build_snapshots(inventory_id, day):
+    """
+    Genera (o regenera) la foto de stock de un inventario al final de `day`
+    a partir de la foto anterior y los movimientos desde entonces. No hace commit.
+    Solo días cerrados: una foto de hoy dejaría fuera los movimientos posteriores del día.
+    """
+    if day >= date.today():
+        raise ValueError("Solo se pueden generar fotos de días anteriores a hoy")
+    stocks, _ = _stock_from_nearest_snapshot(inventory_id, day - timedelta(days=1))
+    deltas = _ledger_deltas(inventory_id).filter(
+        Movement.date >= _end_of(day - timedelta(days=1)),
+        Movement.date < _end_of(day)
+    ).group_by(Movement.product_id)
+    for pid, delta in deltas:
+        stocks[pid] = stocks.get(pid, 0) + int(delta or 0)
+
+    StockSnapshot.query.filter_by(inventory_id=inventory_id, snapshot_date=day).delete(synchronize_session=False)
+    if stocks:
+        db.session.execute(insert(StockSnapshot), [
+            {"inventory_id": inventory_id, "product_id": pid, "snapshot_date": day, "stock": stock}
+            for pid, stock in stocks.items()
+        ])
+    return len(stocks)
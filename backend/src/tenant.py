@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import namedtuple
+from flask import g, current_app
+from flask_jwt_extended import get_jwt_identity
+from src.models import db, User, Inventory, Configuration
+
+# Datos del usuario autenticado que usan casi todas las rutas
+Tenant = namedtuple("Tenant", ["user_id", "inventory_id", "configuration_id", "impuesto"])
+
+# Caché en memoria del proceso: identidad JWT -> (expira_en, Tenant)
+_cache = {}
+_lock = threading.Lock()
+MAX_CACHE_ENTRIES = 10000
+
+
+def _load_tenant(identity):
+    # Usuario, inventario y configuración en una sola consulta
+    row = (
+        db.session.query(User.id, Inventory.id, Configuration.id, Configuration.impuesto)
+        .outerjoin(Inventory, Inventory.user_id == User.id)
+        .outerjoin(Configuration, Configuration.user_id == User.id)
+        .filter(User.id == identity)
+        .first()
+    )
+    return Tenant(*row) if row else None
+
+
+def get_current_tenant():
+    """
+    Resuelve el usuario autenticado una sola vez por request (en flask.g).
+    Si TENANT_CACHE_TTL > 0 también se guarda en una caché del proceso
+    por esa cantidad de segundos.
+    """
+    if "tenant" in g:
+        return g.tenant
+
+    identity = str(get_jwt_identity())
+    ttl = current_app.config.get("TENANT_CACHE_TTL", 0)
+    now = time.monotonic()
+
+    tenant = None
+    if ttl:
+        with _lock:
+            entry = _cache.get(identity)
+        if entry and entry[0] > now:
+            tenant = entry[1]
+
+    if tenant is None:
+        tenant = _load_tenant(identity)
+        if tenant and ttl:
+            with _lock:
+                if len(_cache) >= MAX_CACHE_ENTRIES:
+                    for key in [k for k, (expires, _) in _cache.items() if expires <= now]:
+                        del _cache[key]
+                    if len(_cache) >= MAX_CACHE_ENTRIES:
+                        _cache.clear()
+                _cache[identity] = (now + ttl, tenant)
+
+    g.tenant = tenant
+    return tenant
+
+
+def invalidate_tenant(user_id):
+    """Descarta el tenant cacheado tras cambiar el usuario, su inventario o su configuración."""
+    with _lock:
+        _cache.pop(str(user_id), None)
+    tenant = g.get("tenant")
+    if tenant and str(tenant.user_id) == str(user_id):
+        g.pop("tenant")
@@ -0,0 +1,4 @@
+# Punto de entrada WSGI para producción: gunicorn -c gunicorn.conf.py src.wsgi:app
+from src.app import create_app
+
+app = create_app()
@@ -195,31 +195,7 @@ const Productos = () => {
       .then((productoCreado) => {
         setProductos([...productos, productoCreado]);
         toast.success("Producto creado exitosamente.");
-        // Registrar movimiento de ingreso
-        fetch("/api/movements", {
-          method: "POST",
-          headers: {
-            "Content-Type": "application/json",
-            "Authorization": `Bearer ${token}`,
-          },
-          body: JSON.stringify({
-            product_id: productoCreado.id,
-            inventory_id: productoCreado.inventory_id,
-            type: "ingreso",
-            quantity: productoCreado.stock,
-          }),
-        })
-          .then((resp) => {
-            if (!resp.ok) throw new Error(`Error HTTP: ${resp.status}`);
-            return resp.json();
-          })
-          .then(() => {
-            toast.success("Movimiento de ingreso registrado.");
-          })
-          .catch((err) => {
-            console.error("Error al registrar movimiento:", err);
-            toast.error("Error al registrar el movimiento.");
-          });
+        // El backend registra el movimiento de ingreso del stock inicial
       })
       .catch((err) => {
         console.error("Error al agregar producto:", err);